@@ -0,0 +1,328 @@
+"""
+TaskTracker benchmarks
+Times and measures the peak memory of loading, sorting, counting, saving and refreshing tasks
+for each version of TaskTracker, using generated tasks files of different sizes, and times
+starting audio.
+Run from the repository folder with: python -m benchmarks.benchmark --sizes 1000 10000
+"""
+
+import argparse
+import ast
+import gc
+import importlib
+import importlib.util
+import inspect
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+SIZES = [1000, 10000, 100000, 1000000]
+# Folder, package and task collection class of each version that is benchmarked
+TARGETS = [
+    ("version1/patch0", "version1.patch0.taskcollection", "TaskCollection"),
+    ("version2/patch0", "version2.patch0.taskcollection", "TaskCollection"),
+    ("version2/patch1", "version2.patch1.taskcollection", "TaskCollection"),
+    ("version2/patch1", "version2.patch1.columnartaskcollection", "ColumnarTaskCollection"),
+    ("version2/patch1", "version2.patch1.sqlitetaskcollection", "SQLiteTaskCollection"),
+    ("version2/patch1", "version2.patch1.snapshottaskcollection", "SnapshotTaskCollection"),
+    ("version2/patch1", "version2.patch1.mappedtaskcollection", "MappedTaskCollection"),
+]
+# Version whose CSV parser is compared with the split loop it replaced
+PARSER_FOLDER = "version2/patch1"
+NAMES = ["Assignment", "Exam Prep", "Lecture", "Prac", "Reading", "Project", "Quiz", "Lab Report"]
+SUBJECTS = ["CP{}".format(number) for number in range(1401, 1421)]
+DUE_DATE_CHANCE = 0.7
+# Number of distinct due dates in the tasks files used to benchmark parsing repeated due dates
+REPEATED_DUE_DATES = 30
+COMPLETED_CHANCE = 0.3
+# Code run in a new interpreter to time starting audio, by initializing all of pygame or only its mixer
+AUDIO_STARTUP_CODE = {
+    "audio startup (pygame.init)": "import pygame; pygame.init()",
+    "audio startup (pygame.mixer)": "import pygame; pygame.mixer.init()",
+}
+
+
+def main():
+    """Generate tasks files, benchmark each version against them and print the results."""
+    parser = argparse.ArgumentParser(description="Benchmark TaskTracker versions.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="numbers of tasks to benchmark")
+    parser.add_argument("--versions", nargs="+", help="only benchmark these version folders, e.g. version2/patch1")
+    parser.add_argument("--seed", type=int, default=0, help="seed for generating tasks")
+    arguments = parser.parse_args()
+
+    targets = [target for target in TARGETS if not arguments.versions or target[0] in arguments.versions]
+    print("{:<40}{:>10}  {:<28}{:>12}{:>14}".format("Version", "Tasks", "Operation", "Seconds", "Peak MiB"))
+    with tempfile.TemporaryDirectory() as directory:
+        for size in arguments.sizes:
+            file_names = {}
+            for has_due_dates in (False, True):
+                file_names[has_due_dates] = os.path.join(directory, "tasks_{}_{}.csv".format(size, has_due_dates))
+                write_tasks_file(file_names[has_due_dates], size, has_due_dates, arguments.seed)
+            for folder, module_name, class_name in targets:
+                collection_class = getattr(importlib.import_module(module_name), class_name)
+                name = "{} ({})".format(folder, class_name)
+                # version1 tasks files have no due date column
+                file_name = file_names[not folder.startswith("version1")]
+                for operation, seconds, peak in benchmark_collection(folder, collection_class, file_name, directory):
+                    print("{:<40}{:>10}  {:<28}{:>12.4f}{:>14.2f}".format(name, size, operation, seconds, peak / 2 ** 20))
+            if any(target[0] == PARSER_FOLDER for target in targets):
+                repeated_dates_file_name = os.path.join(directory, "tasks_{}_repeated_dates.csv".format(size))
+                write_tasks_file(repeated_dates_file_name, size, True, arguments.seed, REPEATED_DUE_DATES)
+                results = list(benchmark_parsing(file_names[True])) + list(benchmark_dates(repeated_dates_file_name))
+                for operation, seconds, peak in results:
+                    print("{:<40}{:>10}  {:<28}{:>12.4f}{:>14.2f}".format(PARSER_FOLDER + " (parsers)", size, operation,
+                                                                          seconds, peak / 2 ** 20))
+    if any(target[0] == PARSER_FOLDER for target in targets):
+        for operation, seconds in benchmark_audio_startup():
+            print("{:<40}{:>10}  {:<28}{:>12.4f}".format(PARSER_FOLDER + " (audio)", "-", operation, seconds))
+
+
+def write_tasks_file(file_name, number_of_tasks, has_due_dates, seed, number_of_due_dates=None):
+    """Write a tasks file of number_of_tasks random tasks, with a due date column if has_due_dates.
+    If number_of_due_dates is given, due dates are chosen from that many distinct dates."""
+    generator = random.Random(seed)
+    due_dates = None
+    if number_of_due_dates is not None:
+        due_dates = ["{}/{}/{}".format(generator.randint(1, 28), generator.randint(1, 12), generator.randint(2019, 2022))
+                     for _ in range(number_of_due_dates)]
+    with open(file_name, 'w') as file_out:
+        for number in range(number_of_tasks):
+            parts = ["{} {}".format(generator.choice(NAMES), number), generator.choice(SUBJECTS),
+                     generator.randint(1, 10)]
+            if has_due_dates:
+                if generator.random() < DUE_DATE_CHANCE:
+                    if due_dates is not None:
+                        parts.append(generator.choice(due_dates))
+                    else:
+                        parts.append("{}/{}/{}".format(generator.randint(1, 28), generator.randint(1, 12),
+                                                       generator.randint(2019, 2022)))
+                else:
+                    parts.append("None")
+            parts.append(generator.random() < COMPLETED_CHANCE)
+            print(",".join(str(part) for part in parts), file=file_out)
+
+
+def get_sorting_attributes(folder):
+    """Return the sorting attributes of a version's SPINNER_SELECTIONS_TO_ATTRIBUTES, read from its
+    main.py without importing it, so that Kivy is not needed."""
+    with open(os.path.join(folder, "main.py"), 'r') as file_in:
+        tree = ast.parse(file_in.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and node.targets[0].id == "SPINNER_SELECTIONS_TO_ATTRIBUTES":
+            return list(ast.literal_eval(node.value).values())
+    return []
+
+
+def measure(setup, operation):
+    """Return the seconds taken and peak bytes allocated by operation, which is passed the result
+    of setup. Memory is measured in a second run so tracing does not slow down the timed run."""
+    state = setup()
+    gc.collect()
+    start_time = time.perf_counter()
+    operation(state)
+    seconds = time.perf_counter() - start_time
+    state = setup()
+    gc.collect()
+    tracemalloc.start()
+    operation(state)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def benchmark_collection(folder, collection_class, file_name, directory):
+    """Yield the name, seconds taken and peak bytes allocated of each benchmarked operation."""
+
+    def create_collection():
+        return collection_class()
+
+    def create_collection_without_snapshot():
+        # Both runs of measure() read the tasks file, rather than the second reading the snapshot the first wrote
+        snapshot_file_name = file_name + getattr(importlib.import_module(collection_class.__module__),
+                                                 "SNAPSHOT_EXTENSION", "")
+        if snapshot_file_name != file_name and os.path.exists(snapshot_file_name):
+            os.remove(snapshot_file_name)
+        return collection_class()
+
+    def load_collection():
+        task_collection = collection_class()
+        task_collection.load_tasks(file_name)
+        return task_collection
+
+    yield ("load_tasks",) + measure(create_collection_without_snapshot,
+                                    lambda task_collection: task_collection.load_tasks(file_name))
+    # Loading the tasks file the first time writes a snapshot that later loads read instead
+    if hasattr(collection_class, "read_snapshot"):
+        yield ("load_tasks (snapshot)",) + measure(create_collection,
+                                                   lambda task_collection: task_collection.load_tasks(file_name))
+
+    sort_has_two_keys = "key1" in inspect.signature(collection_class.sort_tasks).parameters
+    for attribute in get_sorting_attributes(folder):
+        def sort(task_collection):
+            if sort_has_two_keys:
+                task_collection.sort_tasks(key1="is_completed", key2=attribute)
+            else:
+                task_collection.sort_tasks(key=attribute)
+            # Collections that sort lazily only pay for sorting once the sorted tasks are used
+            if hasattr(task_collection, "get_sorted_tasks"):
+                for _ in task_collection.get_sorted_tasks():
+                    pass
+
+        yield ("sort_tasks ({})".format(attribute),) + measure(load_collection, sort)
+
+    yield ("get_num_of_uncompleted_tasks",) + measure(
+        load_collection, lambda task_collection: task_collection.get_num_of_uncompleted_tasks())
+    save_file_name = os.path.join(directory, "saved.csv")
+    yield ("save_tasks",) + measure(load_collection, lambda task_collection: task_collection.save_tasks(save_file_name))
+
+    refresh_result = benchmark_refresh(folder, load_collection)
+    if refresh_result is not None:
+        yield ("refresh_buttons",) + refresh_result
+
+
+def benchmark_parsing(file_name):
+    """Yield the name, seconds taken and peak bytes allocated of reading every task in file_name
+    with the line splitting loop that tasks files used to be read with, and in batches with
+    TaskCollection.read_task_batches(). Both check every due date, so they do the same work."""
+    from version2.patch1.task import Task
+    from version2.patch1.date import get_date
+    from version2.patch1.taskcollection import TaskCollection
+
+    def split_parse_tasks(_):
+        tasks = []
+        with open(file_name, 'r') as file_in:
+            for line in file_in:
+                try:
+                    parts = line.strip().split(",")
+                    task_id = int(parts[5]) if len(parts) > 5 and parts[5] else None
+                    get_date(parts[3])
+                    tasks.append(Task(parts[0], parts[1], int(parts[2]), parts[3], parts[4] == "True", task_id))
+                except (IndexError, ValueError):
+                    continue
+        return tasks
+
+    def batch_parse_tasks(_):
+        return [task for batch in TaskCollection.read_task_batches(file_name) for task in batch]
+
+    yield ("parse (split loop)",) + measure(lambda: None, split_parse_tasks)
+    yield ("parse (read_task_batches)",) + measure(lambda: None, batch_parse_tasks)
+
+
+def benchmark_dates(file_name):
+    """Yield the name, seconds taken and peak bytes allocated of loading a tasks file of repeated
+    due dates with and without get_date()'s cache, and of finding the day number of every task's
+    due date, creating a Date for each task and sharing the cached Date of each distinct due date,
+    then of keeping, sorting and indexing a Date for each task."""
+    from version2.patch1 import taskcollection
+    from version2.patch1.date import Date, get_date
+    from version2.patch1.taskcollection import TaskCollection
+
+    def load_collection():
+        get_date.cache_clear()
+        task_collection = TaskCollection()
+        task_collection.load_tasks(file_name)
+        return task_collection
+
+    def load_tasks(_):
+        load_collection()
+
+    def load_tasks_without_cache(_):
+        # Due dates are checked by creating a new Date each time, as they were before get_date() was cached
+        taskcollection.get_date = get_date.__wrapped__
+        try:
+            load_collection()
+        finally:
+            taskcollection.get_date = get_date
+
+    def create_dates(task_collection):
+        for task in task_collection.tasks:
+            Date(task.due_date_string).ordinal
+
+    def get_dates(task_collection):
+        for task in task_collection.tasks:
+            task.due_date.ordinal
+
+    def load_dates():
+        return [Date(task.due_date_string) for task in load_collection().tasks]
+
+    def keep_dates(dates):
+        dates[:] = [Date(date.string) for date in dates]
+
+    def sort_dates(dates):
+        dates.sort()
+
+    def index_dates(dates):
+        indexes = {}
+        for index, date in enumerate(dates):
+            indexes.setdefault(date, []).append(index)
+
+    yield ("load_tasks (get_date cache)",) + measure(lambda: None, load_tasks)
+    yield ("load_tasks (no date cache)",) + measure(lambda: None, load_tasks_without_cache)
+    yield ("due dates (Date per task)",) + measure(load_collection, create_dates)
+    yield ("due dates (get_date)",) + measure(load_collection, get_dates)
+    yield ("due dates (keep Dates)",) + measure(load_dates, keep_dates)
+    yield ("due dates (sort Dates)",) + measure(load_dates, sort_dates)
+    yield ("due dates (index Dates)",) + measure(load_dates, index_dates)
+
+
+def benchmark_refresh(folder, load_collection):
+    """Return the seconds taken and peak bytes allocated by refresh_buttons on a TaskTrackerApp
+    that is built but never run, or None if the version's app cannot be imported (e.g. Kivy or
+    pygame are not installed)."""
+    package = folder.replace("/", ".")
+    try:
+        main_module = importlib.import_module(package + ".main")
+        from kivy.app import App
+        from kivy.lang import Builder
+    except ImportError:
+        return None
+    working_directory = os.getcwd()
+    os.chdir(folder)
+    try:
+        app = main_module.TaskTrackerApp()
+        App._running_app = app
+        app.root = Builder.load_file("app.kv")
+
+        def set_up_app():
+            app.task_collection = load_collection()
+            app.task_list_needs_rebuilding = True
+            # Versions that load tasks in the background are set up as if tasks had loaded and been
+            # shown, with an empty task list, and the refresh scheduled when the app was created is cancelled
+            if hasattr(app, "update_buttons_trigger"):
+                app.update_buttons_trigger.cancel()
+                app.is_loading_tasks = False
+                app.has_shown_tasks = True
+                app.task_list_rows = []
+                app.task_list_start = 0
+                app.root.ids.tasks_box.data = []
+            return app
+
+        # Versions that update buttons on the next frame do the work of refresh_buttons in update_buttons
+        if hasattr(app, "update_buttons"):
+            return measure(set_up_app, lambda built_app: built_app.update_buttons())
+        return measure(set_up_app, lambda built_app: built_app.refresh_buttons())
+    finally:
+        Builder.unload_file("app.kv")
+        os.chdir(working_directory)
+
+
+def benchmark_audio_startup():
+    """Yield the name and seconds taken of each way of starting audio, each timed in a new
+    interpreter so pygame is not already imported. Nothing is yielded if pygame is not installed,
+    and a way is skipped if it fails (e.g. there is no audio device)."""
+    if importlib.util.find_spec("pygame") is None:
+        return
+    for operation, code in AUDIO_STARTUP_CODE.items():
+        timed_code = ("import time; start_time = time.perf_counter(); {}; "
+                      "print(time.perf_counter() - start_time)".format(code))
+        result = subprocess.run([sys.executable, "-c", timed_code], capture_output=True, text=True)
+        if result.returncode == 0:
+            yield operation, float(result.stdout.split()[-1])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+"""Tests of the version2/patch1 task collections. Run with python -m unittest from the repository root."""
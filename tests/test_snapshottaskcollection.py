@@ -0,0 +1,122 @@
+"""Tests of SnapshotTaskCollection - writing the binary snapshot of a tasks file, reading it back,
+and falling back to the tasks file when the snapshot cannot be used."""
+
+import os
+import tempfile
+import unittest
+from version2.patch1.task import Task
+from version2.patch1.taskcollection import TaskCollection
+from version2.patch1.snapshottaskcollection import SnapshotTaskCollection, SNAPSHOT_EXTENSION, SNAPSHOT_HEADER
+
+TASK_LINES = ["Essay,CP1401,3,1/6/2020,False,1", '"Prac, with ""quotes""",CP1404,5,None,False,2',
+              '"Two\nlines",CP1406,8,2/6/2020,True,3', "Quiz,CP1401,1,31/2/2020,True,4",
+              "Report,CP1402,2,1/1/10000,False,5"]
+
+
+class SnapshotTaskCollectionTest(unittest.TestCase):
+    """Tests of the snapshot written next to a tasks file."""
+
+    def setUp(self):
+        """Create a tasks file of TASK_LINES in a temporary directory."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.file_name = os.path.join(self.directory.name, "tasks.csv")
+        self.snapshot_file_name = self.file_name + SNAPSHOT_EXTENSION
+        TaskCollection.write_lines(self.file_name, TASK_LINES)
+
+    def load_collection(self):
+        """Return a collection of the tasks file, which is loaded from the snapshot if it is current."""
+        task_collection = SnapshotTaskCollection()
+        task_collection.load_tasks(self.file_name)
+        return task_collection
+
+    def is_snapshot_current(self):
+        """Return True if loading the tasks file would read the snapshot rather than the tasks file."""
+        task_collection = SnapshotTaskCollection()
+        task_collection.read_task_batches(self.file_name)
+        return task_collection.snapshot_is_current
+
+    def test_snapshot_round_trip(self):
+        """A snapshot written when the tasks file is loaded reads back as the same tasks."""
+        self.assertFalse(self.is_snapshot_current())
+        task_collection = self.load_collection()
+        self.assertTrue(self.is_snapshot_current())
+        loaded_collection = self.load_collection()
+        self.assertEqual(get_state(loaded_collection), get_state(task_collection))
+        self.assertEqual(get_state(loaded_collection), get_state(load_csv(self.file_name)))
+
+    def test_saved_changes(self):
+        """Saving writes a snapshot of the saved tasks, and tasks added after loading the snapshot get new IDs."""
+        task_collection = self.load_collection()
+        task_collection.mark_task_as_uncompleted(task_collection.get_task(3))
+        task_collection.change_task_priority(task_collection.get_task(1), 2)
+        task_collection.remove_task(task_collection.get_task(2))
+        task_collection.add_task(Task("Exam", "CP1407", 9, "3/6/2020"))
+        task_collection.save_tasks(self.file_name)
+        self.assertTrue(self.is_snapshot_current())
+        loaded_collection = self.load_collection()
+        self.assertEqual(get_state(loaded_collection), get_state(task_collection))
+        self.assertEqual(get_state(loaded_collection), get_state(load_csv(self.file_name)))
+        loaded_collection.add_task(Task("Lab", "CP1404", 1))
+        self.assertEqual(len({task.task_id for task in loaded_collection.tasks}), len(loaded_collection))
+
+    def test_tasks_file_newer_than_snapshot(self):
+        """The tasks file is read instead of a snapshot that is older than it."""
+        self.load_collection()
+        TaskCollection.write_lines(self.file_name, TASK_LINES[:2])
+        snapshot_time = os.path.getmtime(self.snapshot_file_name)
+        os.utime(self.file_name, (snapshot_time + 1, snapshot_time + 1))
+        self.assertFalse(self.is_snapshot_current())
+        self.assertEqual(get_state(self.load_collection()), get_state(load_csv(self.file_name)))
+
+    def test_incomplete_snapshot(self):
+        """The tasks file is read instead of a snapshot that was cut off."""
+        self.load_collection()
+        os.truncate(self.snapshot_file_name, os.path.getsize(self.snapshot_file_name) - 1)
+        self.assertFalse(self.is_snapshot_current())
+        self.assertEqual(get_state(self.load_collection()), get_state(load_csv(self.file_name)))
+
+    def test_wrong_magic(self):
+        """The tasks file is read instead of a file that is not a snapshot."""
+        self.load_collection()
+        with open(self.snapshot_file_name, 'r+b') as file_out:
+            file_out.write(b"XXXX")
+        self.assertFalse(self.is_snapshot_current())
+
+    def test_header_only(self):
+        """A snapshot shorter than its header is not read."""
+        with open(self.snapshot_file_name, 'wb') as file_out:
+            file_out.write(bytes(SNAPSHOT_HEADER.size - 1))
+        self.assertFalse(self.is_snapshot_current())
+
+    def test_string_separator_in_task(self):
+        """No snapshot is written if a task's name contains the character separating the string table."""
+        TaskCollection.write_lines(self.file_name, ["Essay\0,CP1401,3,None,False,1"])
+        self.load_collection()
+        self.assertFalse(os.path.exists(self.snapshot_file_name))
+
+    def test_missing_tasks_file(self):
+        """A snapshot is not used once its tasks file no longer exists, so there are no tasks."""
+        self.load_collection()
+        os.remove(self.file_name)
+        task_collection = SnapshotTaskCollection()
+        self.assertRaises(FileNotFoundError, list, task_collection.read_task_batches(self.file_name))
+        self.assertFalse(task_collection.snapshot_is_current)
+        self.assertEqual(len(task_collection), 0)
+
+
+def load_csv(file_name):
+    """Return a TaskCollection of the tasks in file_name, read from the tasks file."""
+    task_collection = TaskCollection()
+    task_collection.load_tasks(file_name)
+    return task_collection
+
+
+def get_state(task_collection):
+    """Return the attributes of every task in task_collection, sorted by task ID."""
+    return sorted((task.task_id, task.name, task.subject, task.priority, task.due_date_string, task.is_completed)
+                  for task in task_collection.tasks)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+"""Tests of TaskJournal - records cut off by a crash, replaying records more than once, and
+compactions that were interrupted by a crash."""
+
+import os
+import tempfile
+import unittest
+from version2.patch1.task import Task
+from version2.patch1.taskcollection import TaskCollection, JOURNAL_EXTENSION
+from version2.patch1.taskjournal import OLD_JOURNAL_EXTENSION
+
+TASK_LINES = ["Essay,CP1401,3,1/6/2020,False,1", "Prac,CP1404,5,None,False,2", "Exam,CP1406,8,2/6/2020,True,3"]
+
+
+class TaskJournalTest(unittest.TestCase):
+    """Tests of recording changes to a journal and replaying them after TaskTracker stops."""
+
+    def setUp(self):
+        """Create a tasks file of TASK_LINES in a temporary directory."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.file_name = os.path.join(self.directory.name, "tasks.csv")
+        self.journal_file_name = self.file_name + JOURNAL_EXTENSION
+        TaskCollection.write_lines(self.file_name, TASK_LINES)
+
+    def open_collection(self):
+        """Return a collection of the tasks file with its journal replayed, as TaskTracker opens it."""
+        task_collection = TaskCollection()
+        task_collection.open_journal(self.file_name)
+        self.addCleanup(task_collection.journal.close)
+        task_collection.load_tasks(self.file_name)
+        task_collection.replay_journal()
+        return task_collection
+
+    def make_changes(self, task_collection):
+        """Make one change of each kind that is recorded to the journal."""
+        task_collection.add_task(Task("Report", "CP1402", 2, "3/6/2020"))
+        task_collection.mark_task_as_completed(task_collection.get_task(1))
+        task_collection.mark_task_as_uncompleted(task_collection.get_task(3))
+        task_collection.change_task_priority(task_collection.get_task(2), 4)
+        task_collection.remove_task(task_collection.get_task(3))
+
+    def test_changes_are_replayed(self):
+        """Changes that were only recorded to the journal are restored when the tasks file is loaded again."""
+        task_collection = self.open_collection()
+        self.make_changes(task_collection)
+        task_collection.journal.close()
+        self.assertEqual(get_state(self.open_collection()), get_state(task_collection))
+
+    def test_incomplete_record_is_removed(self):
+        """A record cut off by a crash is not replayed, and is removed so it is not joined to the next record."""
+        task_collection = self.open_collection()
+        task_collection.mark_task_as_completed(task_collection.get_task(2))
+        task_collection.journal.close()
+        # Cut off while writing "complete,12", which would otherwise complete task 1
+        with open(self.journal_file_name, 'a') as file_out:
+            file_out.write("complete,1")
+        task_collection = self.open_collection()
+        self.assertFalse(task_collection.get_task(1).is_completed)
+        self.assertTrue(task_collection.get_task(2).is_completed)
+        with open(self.journal_file_name, 'r') as file_in:
+            self.assertTrue(file_in.read().endswith("\n"))
+        task_collection.change_task_priority(task_collection.get_task(1), 1)
+        task_collection.journal.close()
+        self.assertEqual(self.open_collection().get_task(1).priority, 4)
+
+    def test_replay_is_idempotent(self):
+        """Replaying the same records again leaves the tasks the same as replaying them once."""
+        task_collection = self.open_collection()
+        self.make_changes(task_collection)
+        task_collection.journal.close()
+        expected_state = get_state(task_collection)
+        task_collection = self.open_collection()
+        task_collection.replay_journal()
+        self.assertEqual(get_state(task_collection), expected_state)
+
+    def test_records_already_in_tasks_file(self):
+        """Replaying records onto a tasks file that already contains them leaves the tasks the same."""
+        task_collection = self.open_collection()
+        self.make_changes(task_collection)
+        task_collection.journal.close()
+        TaskCollection.write_lines(self.file_name, [task_collection.format_task(task) for task in task_collection.tasks])
+        self.assertEqual(get_state(self.open_collection()), get_state(task_collection))
+
+    def test_crash_before_compacted_tasks_file_is_written(self):
+        """Records moved to the old journal are still replayed if the compacted tasks file was never written."""
+        task_collection = self.open_collection()
+        self.make_changes(task_collection)
+        task_collection.journal.rotate()
+        task_collection.change_task_priority(task_collection.get_task(1), 2)
+        task_collection.journal.close()
+        self.assertTrue(os.path.exists(self.journal_file_name + OLD_JOURNAL_EXTENSION))
+        self.assertEqual(get_state(self.open_collection()), get_state(task_collection))
+
+    def test_crash_before_old_records_are_discarded(self):
+        """Old records replayed onto the compacted tasks file that already contains them change nothing."""
+        task_collection = self.open_collection()
+        self.make_changes(task_collection)
+        lines = [task_collection.format_task(task) for task in task_collection.tasks]
+        task_collection.journal.rotate()
+        TaskCollection.write_lines(self.file_name, lines)
+        task_collection.change_task_priority(task_collection.get_task(1), 2)
+        task_collection.journal.close()
+        self.assertEqual(get_state(self.open_collection()), get_state(task_collection))
+
+    def test_compaction_after_unfinished_compaction(self):
+        """A compaction started while the old journal of a crashed compaction remains keeps both sets of
+        records until the tasks file is written, then discards them."""
+        task_collection = self.open_collection()
+        self.make_changes(task_collection)
+        task_collection.journal.rotate()
+        task_collection.journal.close()
+        task_collection = self.open_collection()
+        task_collection.change_task_priority(task_collection.get_task(1), 2)
+        task_collection.compact_journal(self.file_name)
+        task_collection.wait_for_compaction()
+        task_collection.journal.close()
+        self.assertFalse(os.path.exists(self.journal_file_name + OLD_JOURNAL_EXTENSION))
+        self.assertEqual(os.path.getsize(self.journal_file_name), 0)
+        self.assertEqual(get_state(self.open_collection()), get_state(task_collection))
+
+
+def get_state(task_collection):
+    """Return the attributes of every task in task_collection, sorted by task ID."""
+    return sorted((task.task_id, task.name, task.subject, task.priority, task.due_date_string, task.is_completed)
+                  for task in task_collection.tasks)
+
+
+if __name__ == '__main__':
+    unittest.main()
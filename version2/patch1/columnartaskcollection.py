@@ -0,0 +1,318 @@
+"""Columnar Task Collection - This class represents a collection of tasks stored in columns.
+Instead of a list of Task objects, each task attribute is stored in its own compact column:
+names and subjects are dictionary-encoded, priorities and due dates are integer arrays and
+completion is a bitset. Tasks are accessed through lightweight TaskView objects."""
+
+from array import array
+from datetime import date
+from version2.patch1.task import Task
+from version2.patch1.date import get_date, NONE_ORDINAL
+from version2.patch1.taskcollection import TaskCollection, get_page
+from version2.patch1.taskidindex import TaskIdIndex
+
+NO_DUE_DATE = 0
+
+
+class TaskView:
+    """View onto one row of a ColumnarTaskCollection that behaves like a Task.
+    Views stay valid for as long as the collection exists. Views are slotted and only hold their
+    collection and row, and changes made through them are tracked by the collection."""
+    __slots__ = ("collection", "row")
+
+    # Methods that only read the task's attributes are shared with Task
+    __str__ = Task.__str__
+    is_important = Task.is_important
+    is_due = Task.is_due
+
+    def __init__(self, collection, row):
+        """Initialize TaskView class, setting the collection and row it views."""
+        self.collection = collection
+        self.row = row
+
+    def __eq__(self, other):
+        """Return True if both views are of the same row of the same collection."""
+        return isinstance(other, TaskView) and self.collection is other.collection and self.row == other.row
+
+    def __hash__(self):
+        """Return a hash of the viewed row."""
+        return hash((id(self.collection), self.row))
+
+    @property
+    def task_id(self):
+        """Return the task's ID."""
+        return self.collection.task_ids[self.row]
+
+    @property
+    def name(self):
+        """Return the task's name."""
+        return self.collection.strings[self.collection.names[self.row]]
+
+    @property
+    def subject(self):
+        """Return the task's subject."""
+        return self.collection.strings[self.collection.subjects[self.row]]
+
+    @property
+    def priority(self):
+        """Return the task's priority."""
+        return self.collection.priorities[self.row]
+
+    @priority.setter
+    def priority(self, priority):
+        """Set the task's priority."""
+        self.collection.priorities[self.row] = priority
+
+    @property
+    def due_date_string(self):
+        """Return the task's due date as it is written in the tasks file."""
+        return self.collection.decode_due_date(self.collection.due_dates[self.row])
+
+    @property
+    def due_date(self):
+        """Return the task's due date as a Date object."""
+        return get_date(self.due_date_string)
+
+    @property
+    def is_completed(self):
+        """Return True if the task is completed, False if it is not."""
+        return self.collection.is_row_completed(self.row)
+
+    @is_completed.setter
+    def is_completed(self, is_completed):
+        """Set whether or not the task is completed."""
+        self.collection.set_row_completed(self.row, is_completed)
+
+    def mark_as_completed(self):
+        """Mark the task as completed."""
+        self.is_completed = True
+
+    def mark_as_uncompleted(self):
+        """Mark the task as uncompleted."""
+        self.is_completed = False
+
+    def change_priority(self, amount):
+        """Change the task's priority by amount."""
+        self.priority += amount
+
+
+class ColumnarTaskCollection(TaskCollection):
+    """Collection of tasks stored in compact columns, with the same capabilities as TaskCollection."""
+
+    def __init__(self):
+        """Initialize class, create empty columns."""
+        # Dictionary encoding shared by names, subjects and due dates that are not valid dates
+        self.strings = []
+        self.string_codes = {}
+        self.task_ids = array('i')
+        # Index of rows by task ID, which is only built when a task is first looked up
+        self._task_id_index = None
+        self.next_task_id = 1
+        self.names = array('i')
+        self.subjects = array('i')
+        self.priorities = array('i')
+        # Due dates are day numbers, NO_DUE_DATE, or negative string codes for dates that are not valid
+        self.due_dates = array('i')
+        self.completed = bytearray()
+        self.number_of_rows = 0
+        self.removed_rows = set()
+        # Row numbers of tasks that have not been removed, in sorted order
+        self.order = array('i')
+        self.sort_keys = None
+        self.order_is_sorted = False
+        self.is_reversed = False
+        self.journal = None
+        self.compaction_thread = None
+        self.is_dirty = False
+
+    def __len__(self):
+        """Return the number of tasks in the collection."""
+        return len(self.order)
+
+    @property
+    def tasks(self):
+        """Return a list of views of every task, in sorted order."""
+        return [TaskView(self, row) for row in self.order]
+
+    @property
+    def task_id_index(self):
+        """Return the index of rows by task ID, only building it the first time it is needed."""
+        if self._task_id_index is None:
+            self.build_task_id_index()
+        return self._task_id_index
+
+    def build_task_id_index(self):
+        """Index every row by task ID. Tasks are added without checking whether their ID is taken until
+        the index is built, so rows whose ID is taken by an earlier row are given new IDs here."""
+        task_id_index = TaskIdIndex()
+        rows = [row for row in range(self.number_of_rows) if row not in self.removed_rows]
+        for row in sorted(task_id_index.add_rows(self.task_ids, rows)):
+            self.task_ids[row] = self.next_task_id
+            task_id_index.add(self.next_task_id, row)
+            self.next_task_id += 1
+        self._task_id_index = task_id_index
+
+    def replay_journal(self):
+        """Build the task ID index before applying the changes recorded in the journal, so that every
+        task has its final ID before any change to it is recorded."""
+        if self._task_id_index is None:
+            self.build_task_id_index()
+        super().replay_journal()
+
+    def encode_string(self, string):
+        """Return the code of a string, adding it to the string table if it is new."""
+        try:
+            return self.string_codes[string]
+        except KeyError:
+            code = len(self.strings)
+            self.strings.append(string)
+            self.string_codes[string] = code
+            return code
+
+    def encode_due_date(self, due_date_string):
+        """Return the integer stored in the due_dates column for a due date string."""
+        if due_date_string == "None":
+            return NO_DUE_DATE
+        due_date = get_date(due_date_string)
+        if due_date.is_valid:
+            return due_date.ordinal
+        return -1 - self.encode_string(due_date_string)
+
+    def decode_due_date(self, value):
+        """Return the due date string of an integer stored in the due_dates column."""
+        if value == NO_DUE_DATE:
+            return "None"
+        if value < 0:
+            return self.strings[-1 - value]
+        due_date = date.fromordinal(value)
+        return "{}/{}/{}".format(due_date.day, due_date.month, due_date.year)
+
+    def is_row_completed(self, row):
+        """Return True if the task in row is completed, False if it is not."""
+        return bool(self.completed[row >> 3] >> (row & 7) & 1)
+
+    def set_row_completed(self, row, is_completed):
+        """Set the completed bit of row."""
+        if is_completed:
+            self.completed[row >> 3] |= 1 << (row & 7)
+        else:
+            self.completed[row >> 3] &= ~(1 << (row & 7)) & 0xFF
+
+    def add_task(self, task=Task()):
+        """Add Task object to the columns."""
+        self.add_tasks([task])
+        self.is_dirty = True
+        if self.journal is not None:
+            self.journal.record("add", self.format_task(TaskView(self, self.number_of_rows - 1)))
+
+    def add_tasks(self, tasks):
+        """Add a list of Task objects to the columns."""
+        for task in tasks:
+            row = self.number_of_rows
+            task_id = task.task_id
+            if task_id is None or (self._task_id_index is not None and task_id in self._task_id_index):
+                task_id = self.next_task_id
+            self.next_task_id = max(self.next_task_id, task_id + 1)
+            if self._task_id_index is not None:
+                self._task_id_index.add(task_id, row)
+            self.task_ids.append(task_id)
+            self.names.append(self.encode_string(task.name))
+            self.subjects.append(self.encode_string(task.subject))
+            self.priorities.append(task.priority)
+            self.due_dates.append(self.encode_due_date(task.due_date_string))
+            if row & 7 == 0:
+                self.completed.append(0)
+            self.number_of_rows += 1
+            self.set_row_completed(row, task.is_completed)
+            self.order.append(row)
+        self.order_is_sorted = False
+
+    def get_task(self, task_id):
+        """Return a view of the task with task_id, or None if there is no such task."""
+        row = self.task_id_index.get_row(task_id)
+        return None if row is None else TaskView(self, row)
+
+    def remove_task(self, task=Task()):
+        """Remove the row viewed by task from the sorted order and return the task that was removed.
+        The row stays in the columns until the tasks are next saved and loaded, so views stay valid."""
+        if isinstance(task, TaskView) and task.collection is self and task.row not in self.removed_rows:
+            message = str(task) + " removed."
+            self.set_row_completed(task.row, False)
+            self.removed_rows.add(task.row)
+            self.is_dirty = True
+            self.task_id_index.remove_rows({task.row})
+            self.order = array('i', [row for row in self.order if row != task.row])
+            if self.journal is not None:
+                self.journal.record("remove", task.task_id)
+            return message
+
+    def remove_completed_tasks(self):
+        """Remove the rows of all completed tasks in a single pass and return the number of tasks removed."""
+        removed_rows = [row for row in self.order if self.is_row_completed(row)]
+        if removed_rows:
+            self.removed_rows.update(removed_rows)
+            self.is_dirty = True
+            self.task_id_index.remove_rows(self.removed_rows)
+            if self.journal is not None:
+                for row in removed_rows:
+                    self.journal.record("remove", self.task_ids[row])
+            self.order = array('i', [row for row in self.order if not self.is_row_completed(row)])
+            # Every completed row has been removed, so no bits are left set
+            self.completed = bytearray(len(self.completed))
+        return len(removed_rows)
+
+    def snapshot_tasks(self):
+        """Return views of every task and mark the collection as saved. Views have no dirty flag to
+        clear, as changes are tracked by the collection."""
+        self.is_dirty = False
+        return self.tasks
+
+    def update_task(self, task, change, *args):
+        """Call change with args to change task, re-sorting row order next time tasks are sorted."""
+        change(*args)
+        self.order_is_sorted = False
+        self.is_dirty = True
+
+    def get_num_of_uncompleted_tasks(self):
+        """Return the number of uncompleted tasks, counting the set bits of the completed column."""
+        return len(self.order) - bin(int.from_bytes(self.completed, "little")).count("1")
+
+    def get_sort_column(self, key):
+        """Return a list of integers for every row that sort in the same order as attribute key."""
+        if key == "is_completed":
+            return [self.completed[row >> 3] >> (row & 7) & 1 for row in range(self.number_of_rows)]
+        elif key == "priority":
+            return self.priorities
+        elif key == "due_date":
+            # Tasks with no due date or an invalid due date go last
+            return [value if value > 0 else NONE_ORDINAL for value in self.due_dates]
+        else:
+            # Rank the string table once, then compare ranks instead of strings
+            column = self.names if key == "name" else self.subjects
+            ranks = [0] * len(self.strings)
+            for rank, code in enumerate(sorted(range(len(self.strings)), key=self.strings.__getitem__)):
+                ranks[code] = rank
+            return [ranks[code] for code in column]
+
+    def get_sorted_tasks(self):
+        """Return an iterator over views of every task in sorted order, taking reversed sorting into account."""
+        rows = reversed(self.order) if self.is_reversed else self.order
+        return (TaskView(self, row) for row in rows)
+
+    def get_sorted_rows(self, offset=0, limit=-1):
+        """Return a page of the rows of tasks in sorted order, taking reversed sorting into account.
+        offset and limit select the page, with a limit of -1 selecting every row after offset."""
+        return get_page(self.order, self.is_reversed, offset, limit)
+
+    def get_row_task(self, row):
+        """Return a view of the task in row."""
+        return TaskView(self, row)
+
+    def sort_tasks(self, key1="is_completed", key2="due_date", is_reversed=False):
+        """Sort row order by passed in key first, then by priority.
+        Rows are only re-sorted if the keys or tasks have changed since they were last sorted."""
+        if not self.order_is_sorted or self.sort_keys != (key1, key2):
+            keys = list(zip(self.get_sort_column(key1), self.get_sort_column(key2), self.priorities, self.task_ids))
+            self.order = array('i', sorted(self.order, key=keys.__getitem__))
+            self.sort_keys = (key1, key2)
+            self.order_is_sorted = True
+        self.is_reversed = is_reversed
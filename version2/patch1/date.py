@@ -3,20 +3,65 @@ This class represents a date object. This object contains a day, month, and year
 various methods such as:
 is_valid_date
 is_leap_year
-__lt__ for sorting
+comparisons and hashing for sorting and indexing
 """
 
+from datetime import date
+from functools import lru_cache
+from time import monotonic
+
+# Ordinal of "None" dates and dates that are not valid, so they sort after every valid date.
+# Dates are only valid from year 1 to 9999, as later dates would have the same or a later ordinal
+NONE_ORDINAL = date.max.toordinal() + 1
+# Seconds that get_today() reuses the same Date for
+TODAY_CACHE_SECONDS = 60
+# Number of distinct date strings get_date() keeps a shared Date of
+DATE_CACHE_SIZE = 4096
+DAYS_IN_MONTHS = {1: 31, 2: 29, 3: 31, 4: 30, 5: 31, 6: 30, 7: 31, 8: 31, 9: 30, 10: 31, 11: 30, 12: 31}
+
 
 class Date:
     """Date object which can either be "None" or a date with self.day, self.month, self.year.
-    Date is passed in as a string."""
+    Date is passed in as a string. self.ordinal is the day number of the date, used for sorting,
+    comparing and hashing, so Dates can be used as dictionary keys. "None" and dates that are not
+    valid all have the same ordinal, so they are equal to each other and sort after every valid date.
+    Dates cannot be changed once created, so get_date() can share one Date between many tasks."""
+    __slots__ = ("string", "is_none", "day", "month", "year", "is_valid", "ordinal")
 
     def __init__(self, string):
-        """Initialize Date object, setting day, month and year if string is not "None"."""
-        self.string = string
-        self.is_none = self.string == "None"
-        if not self.is_none:
-            self.day, self.month, self.year = [int(part) for part in self.string.split("/")]
+        """Initialize Date object, setting day, month and year if string is not "None".
+        Whether the date is valid and its ordinal are worked out once, here."""
+        is_none = string == "None"
+        day = month = year = None
+        is_valid = False
+        ordinal = NONE_ORDINAL
+        if not is_none:
+            day, month, year = [int(part) for part in string.split("/")]
+            is_valid = (date.min.year <= year <= date.max.year and 0 < month <= 12 and
+                        0 < day <= DAYS_IN_MONTHS[month] and
+                        not (month == 2 and day == 29 and not self.is_leap_year(year)))
+            if is_valid:
+                ordinal = date(year, month, day).toordinal()
+        set_attribute = object.__setattr__
+        set_attribute(self, "string", string)
+        set_attribute(self, "is_none", is_none)
+        set_attribute(self, "day", day)
+        set_attribute(self, "month", month)
+        set_attribute(self, "year", year)
+        set_attribute(self, "is_valid", is_valid)
+        set_attribute(self, "ordinal", ordinal)
+
+    def __setattr__(self, name, value):
+        """Prevent Date objects from being changed, as they may be shared."""
+        raise AttributeError("Date objects cannot be changed")
+
+    def __delattr__(self, name):
+        """Prevent attributes of Date objects from being deleted, as they may be shared."""
+        raise AttributeError("Date objects cannot be changed")
+
+    def __reduce__(self):
+        """Return how to recreate the Date, so it can be copied and pickled."""
+        return Date, (self.string,)
 
     def __str__(self):
         """Define rules for printing class objects."""
@@ -25,27 +70,81 @@ class Date:
         else:
             return "None"
 
+    def __repr__(self):
+        """Return a string that recreates the Date."""
+        return "Date({!r})".format(self.string)
+
+    def __eq__(self, other):
+        """Return True if both dates are the same day."""
+        try:
+            return self.ordinal == other.ordinal
+        except AttributeError:
+            return NotImplemented
+
+    def __ne__(self, other):
+        """Return True if the dates are different days."""
+        try:
+            return self.ordinal != other.ordinal
+        except AttributeError:
+            return NotImplemented
+
     def __lt__(self, other):
         """Return True if date object is less than other, False if it is not."""
-        s_parts = [self.year, self.month, self.day]
-        o_parts = [other.year, other.month, other.day]
-        for x in range(len(s_parts)):
-            if s_parts[x] != o_parts[x]:
-                return s_parts[x] < o_parts[x]
-        return False
+        try:
+            return self.ordinal < other.ordinal
+        except AttributeError:
+            return NotImplemented
+
+    def __le__(self, other):
+        """Return True if date object is less than or equal to other, False if it is not."""
+        try:
+            return self.ordinal <= other.ordinal
+        except AttributeError:
+            return NotImplemented
+
+    def __gt__(self, other):
+        """Return True if date object is greater than other, False if it is not."""
+        try:
+            return self.ordinal > other.ordinal
+        except AttributeError:
+            return NotImplemented
+
+    def __ge__(self, other):
+        """Return True if date object is greater than or equal to other, False if it is not."""
+        try:
+            return self.ordinal >= other.ordinal
+        except AttributeError:
+            return NotImplemented
+
+    def __hash__(self):
+        """Return a hash of the date's day number, so equal dates have equal hashes."""
+        return hash(self.ordinal)
 
     def is_valid_date(self):
         """Return True if date is valid, False if it is not."""
-        months_dict = {1: 31, 2: 29, 3: 31, 4: 30, 5: 31, 6: 30,
-                       7: 31, 8: 31, 9: 30, 10: 31, 11: 30, 12: 31}
-        is_leap = lambda y: y % 4 == 0 and y % 100 != 0 or y % 400 == 0
-        try:
-            if self.year >= 0 and 0 < self.month <= 12 and 0 < self.day <= months_dict[self.month]:
-                if not is_leap(self.year) and self.month == 2 and self.day == 29:
-                    return False
-                else:
-                    return True
-            else:
-                return False
-        except:
-            return False
+        return self.is_valid
+
+    @staticmethod
+    def is_leap_year(year):
+        """Return True if year is a leap year, False if it is not."""
+        return year % 4 == 0 and year % 100 != 0 or year % 400 == 0
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def get_date(string):
+    """Return a Date of string, parsing and validating each distinct string only once while it
+    is one of the DATE_CACHE_SIZE most recently used. Raise ValueError if string is not a date."""
+    return Date(string)
+
+
+today_cache = {"date": None, "expiry_time": 0}
+
+
+def get_today():
+    """Return a Date of today. The same Date is returned for TODAY_CACHE_SECONDS, so many tasks
+    can be checked against today without creating a new Date for each one."""
+    if monotonic() >= today_cache["expiry_time"]:
+        today = date.today()
+        today_cache["date"] = Date("{}/{}/{}".format(today.day, today.month, today.year))
+        today_cache["expiry_time"] = monotonic() + TODAY_CACHE_SECONDS
+    return today_cache["date"]
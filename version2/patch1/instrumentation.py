@@ -0,0 +1,123 @@
+"""Instrumentation - This class times and counts the actions TaskTrackerApp performs.
+Recent timings of each action are kept so that their p50 and p99 latencies can be displayed
+along with the counters, and one chosen action can be profiled with cProfile to a pstats file. The time taken by each
+step of starting the app is also kept, so where startup time goes can be displayed. Timings and
+counters are kept behind a lock, as actions are also timed on the loading and saving threads."""
+
+import cProfile
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from threading import Lock
+from time import perf_counter
+
+# Number of recent timings of each action that percentiles are calculated from
+TIMING_WINDOW_SIZE = 200
+PROFILE_EXTENSION = ".pstats"
+
+
+class Instrumentation:
+    """Timers and counters for named actions, which do nothing unless instrumentation is enabled."""
+
+    def __init__(self, is_enabled=False, profiled_action=None):
+        """Initialize Instrumentation class, setting whether it is enabled and which action to profile."""
+        self.is_enabled = is_enabled
+        self.profiled_action = profiled_action
+        self.timings = {}
+        self.counters = {}
+        self.lock = Lock()
+        # Seconds taken by each step of starting the app, in the order they were recorded
+        self.startup_steps = {}
+        # Profiler of the profiled action, when it is started and stopped outside of a with block
+        self.profiler = None
+
+    @contextmanager
+    def measure(self, action):
+        """Time the code run inside the with block as action. If action is the profiled action,
+        also profile it and write the stats to action.pstats."""
+        if not self.is_enabled:
+            yield
+            return
+        profiler = cProfile.Profile() if action == self.profiled_action else None
+        if profiler is not None:
+            profiler.enable()
+        start_time = perf_counter()
+        try:
+            yield
+        finally:
+            seconds = perf_counter() - start_time
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(action + PROFILE_EXTENSION)
+            self.record(action, seconds)
+
+    def record(self, action, seconds):
+        """Add a timing of action that was measured elsewhere."""
+        if not self.is_enabled:
+            return
+        with self.lock:
+            if action not in self.timings:
+                self.timings[action] = deque(maxlen=TIMING_WINDOW_SIZE)
+            self.timings[action].append(seconds)
+
+    def record_startup_step(self, step, seconds):
+        """Record the seconds taken by a step of starting the app."""
+        if self.is_enabled:
+            self.startup_steps[step] = seconds
+
+    def start_profiling(self, action):
+        """Start profiling action if it is the profiled action, for actions that do not fit in a with block."""
+        if self.is_enabled and action == self.profiled_action and self.profiler is None:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def stop_profiling(self, action):
+        """Stop profiling action and write the stats to action.pstats, if it is being profiled."""
+        if self.profiler is not None and action == self.profiled_action:
+            self.profiler.disable()
+            self.profiler.dump_stats(action + PROFILE_EXTENSION)
+            self.profiler = None
+
+    def count(self, name, amount=1):
+        """Add amount to the counter called name."""
+        if self.is_enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + amount
+
+    def get_summary(self):
+        """Return a line of the p50 and p99 latencies of every action timed so far, followed by
+        every counter."""
+        with self.lock:
+            sorted_timings = {action: sorted(timings) for action, timings in self.timings.items()}
+            counters = dict(self.counters)
+        parts = []
+        if sorted_timings:
+            parts.append("  ".join("{} {:.1f}/{:.1f}ms".format(action, get_sorted_percentile(timings, 50) * 1000,
+                                                               get_sorted_percentile(timings, 99) * 1000)
+                                   for action, timings in sorted_timings.items()) + "  (p50/p99)")
+        parts.extend("{} {}".format(name, amount) for name, amount in counters.items())
+        return "  ".join(parts)
+
+    def get_startup_summary(self):
+        """Return a line of the time taken by each step of starting the app recorded so far."""
+        if not self.startup_steps:
+            return ""
+        return "startup: " + "  ".join("{} {:.1f}ms".format(step, seconds * 1000)
+                                       for step, seconds in self.startup_steps.items())
+
+
+def get_sorted_percentile(timings, percentile):
+    """Return the percentile (0-100) of sorted timings."""
+    return timings[min(len(timings) - 1, int(len(timings) * percentile / 100))]
+
+
+def instrumented(action):
+    """Decorator that measures every call of a method as action, using the instrumentation
+    attribute of the object the method belongs to."""
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.instrumentation.measure(action):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -5,7 +5,13 @@ Kivy app that displays a list of tasks in GUI form.
 User can add new tasks, change task sorting, and mark tasks as completed/uncompleted.
 """
 
+from time import perf_counter
+
+# Time the app started being imported, so the time it takes to start up can be measured
+START_TIME = perf_counter()
+
 from kivy.app import App
+from kivy.clock import Clock
 from kivy.lang import Builder
 from kivy.properties import StringProperty, ListProperty, NumericProperty, ObjectProperty
 from kivy.core.window import Window
@@ -14,22 +20,55 @@ from kivy.uix.spinner import Spinner
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
 from kivy.uix.popup import Popup
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
+from queue import Queue, Empty
+from threading import Thread
 from version2.patch1.task import Task
 from version2.patch1.taskcollection import TaskCollection
-from version2.patch1.date import Date
-import pygame
-
-pygame.init()
-
-SETTINGS_FILE = "settings.txt"
+from version2.patch1.columnartaskcollection import ColumnarTaskCollection
+from version2.patch1.sqlitetaskcollection import SQLiteTaskCollection
+from version2.patch1.snapshottaskcollection import SnapshotTaskCollection
+from version2.patch1.mappedtaskcollection import MappedTaskCollection
+from version2.patch1.date import Date, get_today
+from version2.patch1.instrumentation import Instrumentation, instrumented
+from version2.patch1.soundplayer import SoundPlayer
+from version2.patch1.settings import Settings
+
+# Time the app finished being imported
+IMPORTED_TIME = perf_counter()
+
+SETTINGS_FILE = "settings.ini"
+# Settings file of older versions, which settings are moved from if there is no settings file
+LEGACY_SETTINGS_FILE = "settings.txt"
+# Seconds between checks for whether the settings file has changed
+SETTINGS_CHECK_INTERVAL = 2
+# Settings that are only used when TaskTracker is next started, as tasks are already loaded with them
+RESTART_SETTINGS = {"tasks_file_name", "task_storage_mode", "save_mode"}
 HELP_FILE = "help.txt"
 SPINNER_SELECTIONS_TO_ATTRIBUTES = {"Priority": "priority", "Subject": "subject",
                                     "Name": "name", "Due Date": "due_date"}
 STARTING_SPINNER_SELECTION_INDEX = 0
+TASK_STORAGE_MODES_TO_COLLECTIONS = {"list": TaskCollection, "columnar": ColumnarTaskCollection,
+                                     "sqlite": SQLiteTaskCollection, "snapshot": SnapshotTaskCollection,
+                                     "mapped": MappedTaskCollection}
+SQLITE_STORAGE_MODE = "sqlite"
+JOURNAL_SAVE_MODE = "journal"
+# Seconds between checks for whether the journal is big enough to be merged into the tasks file
+JOURNAL_COMPACTION_INTERVAL = 60
+JOURNAL_COMPACTION_RECORDS = 500
+# Number of line numbers of invalid rows of the tasks file that are shown
+MAX_REPORTED_ROWS = 10
+# Profiled action that shows how long each step of starting took and profiles startup
+STARTUP_ACTION = "startup"
+# Number of sorted rows in the task list at once. The task list shows a window of the sorted rows
+# that moves as it is scrolled near either end, so its data and views do not grow with the tasks.
+TASK_LIST_WINDOW_ROWS = 200
+# Number of rows from either end of the window at which the window is moved
+TASK_LIST_WINDOW_MARGIN = 20
 
 
 class PrioritySpinner(Spinner, Button):
-    pass
+    task = ObjectProperty(None, allownone=True)
 
 
 class TaskLabel(Label):
@@ -40,6 +79,29 @@ class ButtonBoxLayout(BoxLayout, Button):
     pass
 
 
+class TaskRow(RecycleDataViewBehavior, BoxLayout):
+    """Row of the recycled task list. Rows are reused for different tasks as the list
+    scrolls, with their properties set from the task list's data."""
+    task = ObjectProperty(None, allownone=True)
+    name_text = StringProperty()
+    subject_text = StringProperty()
+    due_date_text = StringProperty()
+    priority_text = StringProperty()
+    background_color = ListProperty([1, 1, 1, 1])
+    due_date_color = ListProperty([1, 1, 1, 1])
+    priority_color = ListProperty([1, 1, 1, 1])
+
+    def refresh_view_attrs(self, rv, index, data):
+        """Set the row's properties from the task in the task collection row its data holds, and move
+        the row's entry in the app's task row registry to that task."""
+        app = App.get_running_app()
+        task_rows = app.task_rows
+        if task_rows.get(self.task) is self:
+            del task_rows[self.task]
+        super().refresh_view_attrs(rv, index, app.get_collection_row_data(data["row"]))
+        task_rows[self.task] = self
+
+
 class HelpPopup(Popup):
     pass
 
@@ -55,19 +117,18 @@ class PrioritySpinnerOption(Button):
 class TaskTrackerApp(App):
     """App that interacts with GUI and utilises Task and TaskCollection classes."""
 
-    completed_color = ()
-    uncompleted_color = ()
-    important_color = ()
-    text_color = ()
-    overdue_color = ()
-    button_color = ()
-    dropdown_color = ()
+    completed_color = ListProperty([1, 1, 1, 1])
+    uncompleted_color = ListProperty([1, 1, 1, 1])
+    important_color = ListProperty([1, 1, 1, 1])
+    text_color = ListProperty([1, 1, 1, 1])
+    overdue_color = ListProperty([1, 1, 1, 1])
+    button_color = ListProperty([1, 1, 1, 1])
+    dropdown_color = ListProperty([1, 1, 1, 1])
 
     tasks_to_complete_text = StringProperty()
     info_panel_text = StringProperty()
+    instrumentation_text = StringProperty()
     help_content = StringProperty()
-    number_of_buttons = NumericProperty()
-    tasks_box_height = NumericProperty()
     help_label_height = NumericProperty()
     spinner_selections = ListProperty()
     sorting_spinner_options = ObjectProperty(SortingSpinnerOption)
@@ -79,35 +140,238 @@ class TaskTrackerApp(App):
         # Default loaded settings
         self.tasks_file_name = ""
         self.completed_sound = ""
+        self.task_storage_mode = "list"
+        self.save_mode = "file"
+        self.is_instrumented = False
+        self.profiled_action = "none"
+        self.autosave_interval = 0
+        self.is_sound_on = True
         self.help_content = ""
         self.help_label_height = 0
         # Load settings
+        settings_start_time = perf_counter()
+        self.settings = Settings(SETTINGS_FILE, LEGACY_SETTINGS_FILE)
         self.load_settings()
-        # Load help content
-        self.load_help_content()
         # Static settings
-        self.task_collection = TaskCollection()
-        self.task_collection.load_tasks(self.tasks_file_name)
+        self.instrumentation = Instrumentation(self.is_instrumented, self.profiled_action)
+        self.instrumentation.record_startup_step("imports", IMPORTED_TIME - START_TIME)
+        self.instrumentation.record_startup_step("load_settings", perf_counter() - settings_start_time)
+        self.instrumentation.start_profiling(STARTUP_ACTION)
+        # Audio is only set up after the first frame, or when a sound is first played
+        self.sound_player = SoundPlayer() if self.is_sound_on else None
+        self.task_collection = TASK_STORAGE_MODES_TO_COLLECTIONS[self.task_storage_mode]()
+        if self.task_storage_mode == SQLITE_STORAGE_MODE:
+            # The database saves every change itself, so there is no save mode
+            self.save_mode = SQLITE_STORAGE_MODE
+        # Tasks are read on a background thread so the window opens without waiting for the tasks file
+        self.is_loading_tasks = True
+        self.loaded_task_batches = Queue()
+        # (line number, row) of each row of the tasks file that is not a valid task
+        self.rejected_task_rows = []
+        # Error that stopped tasks from loading, after which tasks are never saved
+        self.task_loading_error = None
+        try:
+            if self.save_mode == SQLITE_STORAGE_MODE:
+                self.task_collection.open_database(self.tasks_file_name)
+            elif self.save_mode == JOURNAL_SAVE_MODE:
+                self.task_collection.open_journal(self.tasks_file_name)
+            task_batches = self.task_collection.read_task_batches(self.tasks_file_name,
+                                                                  rejected_rows=self.rejected_task_rows)
+        except Exception as error:
+            # Errors opening the database or journal, and collections that open the tasks file
+            # straight away, are reported the same way
+            self.task_loading_error = error
+            task_batches = iter(())
+        self.task_loading_thread = Thread(target=self.read_task_batches, args=(task_batches,), daemon=True)
+        self.loading_start_time = perf_counter()
+        self.task_loading_thread.start()
+        self.task_saving_thread = None
+        self.autosave_trigger = None
+        self.set_up_autosave()
         self.spinner_selections = sorted(SPINNER_SELECTIONS_TO_ATTRIBUTES.keys())
-        self.buttons = []
-        self.priority_spinners = []
+        # TaskRow currently displaying each task, for tasks that are visible
+        self.task_rows = {}
+        # Task collection row shown by each item of the task list's data, and the position in the
+        # sorted rows of the first of them
+        self.task_list_rows = []
+        self.task_list_start = 0
+        # Tasks to restyle on the next frame, unless the whole task list needs rebuilding
+        self.changed_tasks = set()
+        self.task_list_needs_rebuilding = False
+        self.update_buttons_trigger = Clock.create_trigger(self.update_buttons)
+        self.has_refreshed = False
+        self.has_shown_tasks = False
         self.sorting_is_reversed = False
         self.grouping_completed_tasks = True
+        # Help content is read and the help popup built the first time help is shown
+        self.help_popup = None
 
     def build(self):
         """Construct the GUI, setting string and list properties to starting values."""
         self.title = "TaskTracker 2.1"
         self.icon = "icon.png"
         Window.size = (900, 650)
+        build_start_time = perf_counter()
         self.root = Builder.load_file("app.kv")
+        self.instrumentation.record_startup_step("load_file", perf_counter() - build_start_time)
         self.info_panel_text = "Welcome to TaskTracker 2.1!"
+        if self.settings.invalid_options:
+            self.info_panel_text = self.get_invalid_settings_message()
+        elif self.settings.message is not None:
+            self.info_panel_text = self.settings.message
+        self.root.ids.tasks_box.bind(scroll_y=self.move_task_list_window)
         self.refresh_buttons()
+        if self.is_loading_tasks:
+            Clock.schedule_interval(self.add_loaded_task_batches, 0)
+        if self.save_mode == JOURNAL_SAVE_MODE:
+            Clock.schedule_interval(self.compact_task_journal, JOURNAL_COMPACTION_INTERVAL)
+        Clock.schedule_once(self.finish_starting)
+        Clock.schedule_interval(self.reload_settings, SETTINGS_CHECK_INTERVAL)
         return self.root
 
-    def on_stop(self):
-        """Save tasks to tasks.csv when program ends."""
-        self.task_collection.save_tasks(self.tasks_file_name)
+    def finish_starting(self, dt):
+        """Record how long the app took to show its first frame, then do the work that was left
+        until after it, decoding the completed sound on a background thread."""
+        self.instrumentation.record_startup_step("first_frame", perf_counter() - START_TIME)
+        self.instrumentation.stop_profiling(STARTUP_ACTION)
+        if self.sound_player is not None:
+            self.sound_player.load_sound(self.completed_sound)
+        self.show_instrumentation()
 
+    def on_stop(self):
+        """Save tasks to tasks.csv on a background thread when program ends, which Python waits for
+        before exiting. When saving to a journal or database, every change has already been saved,
+        so it only needs to be closed."""
+        if self.save_mode == SQLITE_STORAGE_MODE:
+            self.task_collection.close()
+            return
+        if self.save_mode == JOURNAL_SAVE_MODE:
+            self.task_collection.wait_for_compaction()
+            # There is no journal if it could not be opened
+            if self.task_collection.journal is not None:
+                self.task_collection.journal.close()
+            return
+        if self.autosave_trigger is not None:
+            self.autosave_trigger.cancel()
+        if self.task_saving_thread is not None:
+            self.task_saving_thread.join()
+        # Finish loading any remaining tasks so that none are lost when saving
+        if self.is_loading_tasks:
+            self.task_loading_thread.join()
+            self.add_loaded_task_batches()
+        if self.task_collection.is_dirty:
+            self.start_saving_tasks()
+
+    def set_up_autosave(self):
+        """Create the autosave trigger for the autosave interval, which saves at most once per
+        interval however many changes are made in that time. There is none if autosave is off."""
+        if self.autosave_trigger is not None:
+            self.autosave_trigger.cancel()
+        self.autosave_trigger = None
+        if self.save_mode == "file" and self.autosave_interval > 0:
+            self.autosave_trigger = Clock.create_trigger(self.autosave, self.autosave_interval)
+            if self.task_collection.is_dirty:
+                self.autosave_trigger()
+
+    def schedule_autosave(self):
+        """Schedule an autosave after a change to tasks, unless one is already scheduled."""
+        if self.autosave_trigger is not None:
+            self.autosave_trigger()
+
+    def autosave(self, dt):
+        """Save tasks if they have changed since they were last saved. If tasks are still loading
+        or the last save has not finished, try again after the next autosave interval."""
+        if self.is_loading_tasks or (self.task_saving_thread is not None and self.task_saving_thread.is_alive()):
+            self.autosave_trigger()
+        elif self.task_collection.is_dirty:
+            self.start_saving_tasks()
+
+    def start_saving_tasks(self):
+        """Save a snapshot of the tasks to tasks.csv on a background thread. Nothing is saved if tasks
+        failed to load, so the tasks file is never overwritten with only some of its tasks."""
+        if self.task_loading_error is not None:
+            return
+        self.task_saving_thread = Thread(target=self.save_tasks, args=(self.task_collection.snapshot_tasks(),))
+        self.task_saving_thread.start()
+
+    def save_tasks(self, tasks):
+        """Save tasks to tasks.csv. Run on a background thread."""
+        with self.instrumentation.measure("save_tasks"):
+            self.task_collection.save_tasks(self.tasks_file_name, tasks)
+
+    def compact_task_journal(self, dt):
+        """Merge the journal into the tasks file in the background once it has enough records."""
+        if (not self.is_loading_tasks and self.task_loading_error is None and
+                self.task_collection.journal.number_of_records >= JOURNAL_COMPACTION_RECORDS):
+            self.task_collection.compact_journal(self.tasks_file_name)
+
+    def read_task_batches(self, task_batches):
+        """Read batches of tasks and put them on the loaded_task_batches queue, followed by None once
+        every batch is read. Any error reading them is put on the queue before None, so that it is not
+        mistaken for the end of the file. Run on a background thread, as task_collection is only
+        changed by the main thread."""
+        try:
+            # Time spent reading the tasks file, which is not part of adding tasks on the main thread
+            with self.instrumentation.measure("read_tasks"):
+                for batch in task_batches:
+                    self.loaded_task_batches.put(batch)
+        except FileNotFoundError:
+            # There is no tasks file until tasks are first saved, so there are no tasks to load
+            pass
+        except Exception as error:
+            self.loaded_task_batches.put(error)
+        finally:
+            self.loaded_task_batches.put(None)
+
+    def add_loaded_task_batches(self, dt=0):
+        """Add every batch of tasks read so far to task_collection at once. When every batch has been
+        added, or reading them failed, refresh buttons and return False to stop being scheduled."""
+        tasks = []
+        is_finished = False
+        while not is_finished:
+            try:
+                batch = self.loaded_task_batches.get_nowait()
+            except Empty:
+                break
+            if isinstance(batch, Exception):
+                self.task_loading_error = batch
+                is_finished = True
+            elif batch is None:
+                is_finished = True
+            else:
+                tasks.extend(batch)
+        if tasks:
+            with self.instrumentation.measure("load_tasks"):
+                self.task_collection.add_tasks(tasks)
+            self.instrumentation.count("tasks_loaded", len(tasks))
+        if not is_finished:
+            if tasks and self.root is not None:
+                # The first screen of tasks is shown as soon as it is loaded, rather than once every task is
+                if not self.has_shown_tasks:
+                    self.refresh_buttons()
+                self.tasks_to_complete_text = "Loading tasks... ({} loaded)".format(len(self.task_collection))
+            return
+        self.is_loading_tasks = False
+        if self.task_loading_error is not None:
+            if self.root is not None:
+                self.info_panel_text = "Could not load {} ({}), so changes will not be saved".format(
+                    self.tasks_file_name, self.task_loading_error)
+                self.refresh_buttons()
+            return False
+        self.task_collection.finish_loading(self.tasks_file_name)
+        self.instrumentation.record_startup_step("load_tasks", perf_counter() - self.loading_start_time)
+        if self.save_mode == JOURNAL_SAVE_MODE:
+            self.task_collection.replay_journal()
+        if self.root is not None:
+            if self.rejected_task_rows:
+                self.info_panel_text = "Skipped {} invalid rows of {} (lines {})".format(
+                    len(self.rejected_task_rows), self.tasks_file_name,
+                    ", ".join(str(line_number) for line_number, _ in self.rejected_task_rows[:MAX_REPORTED_ROWS]) +
+                    (", ..." if len(self.rejected_task_rows) > MAX_REPORTED_ROWS else ""))
+            self.refresh_buttons()
+        return False
+
+    @instrumented("mark_completed_or_uncompleted")
     def mark_completed_or_uncompleted(self, instance):
         """If task is completed, mark it as uncompleted. If task is uncompleted, mark it as
         completed. Refresh buttons, update tasks_to_complete and display info message according to
@@ -115,73 +379,175 @@ class TaskTrackerApp(App):
         # Access button's task object
         task = instance.task
         if task.is_completed:
-            task.mark_as_uncompleted()
+            self.task_collection.mark_task_as_uncompleted(task)
             message = "You need to complete {}.".format(task.name)
             message += " Get to work!" if task.is_important() else ""
         else:
-            task.mark_as_completed()
-            self.play_sound(self.completed_sound)
+            self.task_collection.mark_task_as_completed(task)
+            with self.instrumentation.measure("play_sound"):
+                sound_error = self.play_sound(self.completed_sound)
             message = "You completed {}.".format(task.name)
             message += " Great work!" if task.is_important() else ""
+            if sound_error is not None:
+                message += " (Could not play {}: {})".format(self.completed_sound, sound_error)
 
         self.info_panel_text = message
-        self.refresh_buttons()
-
-    def refresh_buttons(self):
-        """Remove all buttons, sort tasks, then create task buttons with task text,
-        function binding, and background colours depending on whether task has been
-        completed or not."""
-        self.root.ids.tasks_box.clear_widgets()
-        self.number_of_buttons = 0
-        # Get sorting attributes
+        self.refresh_buttons(task, "is_completed")
+        self.schedule_autosave()
+
+    def refresh_buttons(self, changed_task=None, changed_attribute=None):
+        """Schedule the task list to be updated on the next frame, so that any number of refreshes
+        in the same frame only update it once. If changed_task is passed in and changed_attribute
+        is not one tasks are sorted by, only changed_task's row is restyled."""
+        if changed_task is None or changed_attribute in self.get_sorting_attributes():
+            self.task_list_needs_rebuilding = True
+        if changed_task is not None:
+            self.changed_tasks.add(changed_task)
+        self.update_buttons_trigger()
+
+    def get_sorting_attributes(self):
+        """Return the attributes tasks are sorted by, in order."""
         attribute2 = SPINNER_SELECTIONS_TO_ATTRIBUTES[self.root.ids.sorting_attribute_selection.text]
         attribute1 = "is_completed" if self.grouping_completed_tasks else attribute2
-        self.task_collection.sort_tasks(key1=attribute1, key2=attribute2, is_reversed=self.sorting_is_reversed)
-
-        for button_number, task in enumerate(self.task_collection.tasks, 1):
-            if task.is_completed:
-                background_color = self.completed_color
-            else:
-                background_color = self.uncompleted_color
-
-            task_button = ButtonBoxLayout(
-                id="button_{}".format(button_number),
-                background_color=background_color,
-                on_release=self.mark_completed_or_uncompleted
-            )
-            name_label = TaskLabel(text=task.name)
-            subject_label = TaskLabel(text=task.subject, size_hint_x=0.8)
-            due_date_label = TaskLabel(
-                text=str(task.due_date),
-                size_hint_x=0.6,
-                color=self.overdue_color if task.is_due() and not task.is_completed else self.text_color,
-            )
-            priority_spinner = PrioritySpinner(
-                id="button_{}_priority".format(button_number),
-                text=str(task.priority),
-                background_color=background_color if not task.is_important() or task.is_completed else self.important_color,
-            )
-            # store reference to button's task object
-            task_button.task = task
-            priority_spinner.task = task
-
-            task_button.add_widget(name_label)
-            task_button.add_widget(subject_label)
-            task_button.add_widget(due_date_label)
-
-            self.root.ids.tasks_box.add_widget(task_button)
-            self.root.ids.tasks_box.add_widget(priority_spinner)
-            self.buttons.append(task_button)
-            self.priority_spinners.append(priority_spinner)
-        self.number_of_buttons = len(self.task_collection.tasks)
-        self.tasks_box_height = self.number_of_buttons * 50
+        return attribute1, attribute2, "priority"
+
+    @instrumented("refresh_buttons")
+    def update_buttons(self, dt=0):
+        """Sort tasks if their order may have changed, then restyle the rows of changed tasks with
+        task text and background colours depending on whether task has been completed or not.
+        Only the rows that are visible are built, and they are reused with new data rather than rebuilt."""
+        start_time = perf_counter()
+        if self.task_list_needs_rebuilding:
+            self.rebuild_task_list()
+        self.restyle_task_rows(self.changed_tasks, get_today())
+        self.task_list_needs_rebuilding = False
+        self.changed_tasks = set()
 
         num_of_uncompleted_tasks = self.task_collection.get_num_of_uncompleted_tasks()
         self.tasks_to_complete_text = "Tasks to complete: {}".format(num_of_uncompleted_tasks)
+        if not self.has_refreshed:
+            self.instrumentation.record_startup_step("first_refresh", perf_counter() - start_time)
+            self.has_refreshed = True
+        self.show_instrumentation()
+
+    def show_instrumentation(self):
+        """Show how long each step of starting took when profiling startup, or the latencies of
+        actions and the counters otherwise, if instrumentation is on."""
+        if not self.instrumentation.is_enabled:
+            return
+        if self.profiled_action == STARTUP_ACTION:
+            self.instrumentation_text = self.instrumentation.get_startup_summary()
+        else:
+            self.instrumentation_text = self.instrumentation.get_summary()
+
+    def rebuild_task_list(self):
+        """Sort tasks and show the window of the task collection's sorted rows. Tasks are shown in the
+        order they were loaded until every task has loaded, and only sorted then, so that the sorted
+        indexes are built once rather than rebuilt for every batch of loaded tasks."""
+        if not self.is_loading_tasks:
+            attribute1, attribute2, _ = self.get_sorting_attributes()
+            with self.instrumentation.measure("sort_tasks"):
+                self.task_collection.sort_tasks(key1=attribute1, key2=attribute2,
+                                                is_reversed=self.sorting_is_reversed)
+        # The window stays where it is, unless tasks were removed from after it
+        self.task_list_start = max(0, min(self.task_list_start, len(self.task_collection) - TASK_LIST_WINDOW_ROWS))
+        rows = list(self.task_collection.get_sorted_rows(self.task_list_start, TASK_LIST_WINDOW_ROWS))
+        self.has_shown_tasks = bool(rows)
+        self.set_task_list_rows(rows)
+
+    def move_task_list_window(self, task_list, scroll_y):
+        """Move the window of sorted rows shown in the task list when it is scrolled near either end of
+        the window and there are more rows past that end, keeping the rows in view where they are."""
+        row_height = task_list.layout_manager.default_size[1]
+        scrollable_height = len(self.task_list_rows) * row_height - task_list.height
+        if scrollable_height <= 0:
+            return
+        # Distance from the top of the window to the top of the view
+        offset = (1 - scroll_y) * scrollable_height
+        top_row = int(offset // row_height)
+        bottom_row = int((offset + task_list.height) // row_height)
+        number_of_rows = len(self.task_collection)
+        is_near_start = top_row < TASK_LIST_WINDOW_MARGIN and self.task_list_start > 0
+        is_near_end = (bottom_row >= len(self.task_list_rows) - TASK_LIST_WINDOW_MARGIN and
+                       self.task_list_start + len(self.task_list_rows) < number_of_rows)
+        if not is_near_start and not is_near_end:
+            return
+        # Centre the rows in view in the new window
+        visible_rows = bottom_row - top_row + 1
+        old_start = self.task_list_start
+        self.task_list_start = max(0, min(old_start + top_row - (TASK_LIST_WINDOW_ROWS - visible_rows) // 2,
+                                          number_of_rows - TASK_LIST_WINDOW_ROWS))
+        rows = list(self.task_collection.get_sorted_rows(self.task_list_start, TASK_LIST_WINDOW_ROWS))
+        self.set_task_list_rows(rows)
+        offset += (old_start - self.task_list_start) * row_height
+        scrollable_height = len(rows) * row_height - task_list.height
+        task_list.scroll_y = min(1, max(0, 1 - offset / scrollable_height)) if scrollable_height > 0 else 1
+        # The scroll effect keeps its own position, which is moved the same way
+        if task_list.effect_y is not None:
+            task_list.effect_y.value = task_list.effect_y.max * task_list.scroll_y
+
+    def set_task_list_rows(self, rows):
+        """Show rows in the task list. Each item of the task list's data only holds its row, and only
+        the items between the first and last rows that changed are replaced, so that moving a task
+        replaces the items it moved past rather than the whole list."""
+        old_rows = self.task_list_rows
+        start = 0
+        end = min(len(old_rows), len(rows))
+        while start < end and old_rows[start] == rows[start]:
+            start += 1
+        old_stop = len(old_rows)
+        stop = len(rows)
+        while old_stop > start and stop > start and old_rows[old_stop - 1] == rows[stop - 1]:
+            old_stop -= 1
+            stop -= 1
+        data = self.root.ids.tasks_box.data
+        if start == old_stop == len(old_rows) and start < stop:
+            data.extend({"row": row} for row in rows[start:stop])
+        elif start == stop and start < old_stop:
+            del data[start:old_stop]
+        elif start < stop or start < old_stop:
+            data[start:old_stop] = [{"row": row} for row in rows[start:stop]]
+        self.task_list_rows = rows
+        self.instrumentation.count("rows_refreshed", stop - start)
+
+    def restyle_task_rows(self, tasks, today):
+        """Update the TaskRows displaying tasks. Tasks that are not displayed are styled when they are."""
+        for task in tasks:
+            task_row = self.task_rows.get(task)
+            if task_row is not None:
+                for name, value in self.get_task_row_data(task, today).items():
+                    setattr(task_row, name, value)
+        self.instrumentation.count("rows_refreshed", len(tasks))
+
+    def get_collection_row_data(self, row):
+        """Return the properties of a TaskRow displaying the task in row of the task collection."""
+        return self.get_task_row_data(self.task_collection.get_row_task(row), get_today())
+
+    def get_task_row_data(self, task, today):
+        """Return the properties of a TaskRow displaying task, where today is the Date that tasks
+        are due or overdue by."""
+        if task.is_completed:
+            background_color = self.completed_color
+        else:
+            background_color = self.uncompleted_color
+        return {
+            "task": task,
+            "name_text": task.name,
+            "subject_text": task.subject,
+            "due_date_text": str(task.due_date),
+            "due_date_color": self.overdue_color if task.is_due(today) and not task.is_completed else self.text_color,
+            "priority_text": str(task.priority),
+            "background_color": background_color,
+            "priority_color": background_color if not task.is_important() or task.is_completed else self.important_color,
+        }
 
     def add_task(self):
         """Get task name, subject, and priority, and if they are valid,
-        add Task to task_collection and refresh buttons."""
+        add Task to task_collection and refresh buttons. Tasks cannot be added while tasks are
+        loading, as a new task could take the ID of a task that has not been read yet."""
+        if self.is_loading_tasks:
+            self.info_panel_text = "Tasks are still loading, add the task once they have loaded"
+            return
         input_fields = [self.root.ids.name_input, self.root.ids.subject_input, self.root.ids.priority_input, self.root.ids.due_date_input]
         name = input_fields[0].text
         subject = input_fields[1].text
@@ -205,6 +571,7 @@ class TaskTrackerApp(App):
                     # Utilize variable arguments to clear text of any amount of widgets
                     self.clear_widget_text(input_fields[0], input_fields[1], input_fields[2], input_fields[3])
                     self.refresh_buttons()
+                    self.schedule_autosave()
             except ValueError:
                 if isinstance(priority, int):
                     self.info_panel_text = "Please enter a valid date (dd/mm/yyyy) or leave blank"
@@ -214,16 +581,18 @@ class TaskTrackerApp(App):
             self.info_panel_text = "All fields must be completed"
 
     def remove_completed_tasks(self):
-        """Remove completed task buttons."""
-        if self.task_collection.get_num_of_uncompleted_tasks() < len(self.task_collection.tasks):
+        """Remove completed tasks and refresh buttons."""
+        displayed_completed_tasks = [task for task in self.task_rows if task is not None and task.is_completed]
+        if self.task_collection.remove_completed_tasks():
             self.info_panel_text = "Completed tasks removed"
+            self.schedule_autosave()
         else:
             self.info_panel_text = "No completed tasks"
-        for button in self.buttons:
-            if button.task.is_completed:
-                self.task_collection.remove_task(button.task)
-                self.root.ids.tasks_box.remove_widget(button)
-                self.root.ids.tasks_box.remove_widget(self.priority_spinners[self.buttons.index(button)])
+        for task in displayed_completed_tasks:
+            del self.task_rows[task]
+        # Rows of removed tasks are taken out of the task list straight away, so they are never displayed
+        self.task_list_needs_rebuilding = True
+        self.update_buttons()
 
     def reverse_sorting(self):
         """Reverse the sorting of tasks."""
@@ -242,16 +611,23 @@ class TaskTrackerApp(App):
 
     def increment_priority(self, instance):
         """Increment task priority by an amount passed in."""
+        # Spinner text also changes when a recycled row is given a task's priority
+        if instance.text not in instance.values:
+            return
         amount = -1 if instance.text == "Up" else 1
         if amount > 0 or instance.task.priority > 1:
-            instance.task.priority += amount
-        self.refresh_buttons()
-
-    @staticmethod
-    def show_help_popup():
-        """Display the help popup."""
-        help_popup = HelpPopup(id="help_popup", title="Help", size_hint=(None, None), size=(600, 600))
-        help_popup.open()
+            self.task_collection.change_task_priority(instance.task, amount)
+        # Show the priority again even if it did not change
+        instance.text = str(instance.task.priority)
+        self.refresh_buttons(instance.task, "priority")
+        self.schedule_autosave()
+
+    def show_help_popup(self):
+        """Display the help popup, loading help content and building the popup the first time."""
+        if self.help_popup is None:
+            self.load_help_content()
+            self.help_popup = HelpPopup(id="help_popup", title="Help", size_hint=(None, None), size=(600, 600))
+        self.help_popup.open()
 
     @staticmethod
     def clear_widget_text(*widgets):
@@ -259,38 +635,68 @@ class TaskTrackerApp(App):
         for widget in widgets:
             widget.text = ""
 
-    @staticmethod
-    def play_sound(sound):
-        """Play the sound of the file passed in using playsound module."""
-        pygame.mixer.Channel(0).play(pygame.mixer.Sound(sound))
+    def play_sound(self, sound):
+        """Play the sound of the file passed in without waiting for it to finish, if sound is on.
+        Return the error if the sound could not be decoded or pygame is not installed, or None."""
+        if self.sound_player is not None:
+            try:
+                self.sound_player.play(sound)
+            # pygame.error is a RuntimeError
+            except (ImportError, RuntimeError, OSError) as error:
+                return error
+        return None
 
     def load_settings(self):
         """Read settings file and change app settings accordingly."""
-        with open(SETTINGS_FILE, 'r') as file_in:
-            file_in.readline()
-            file_in.readline()
-            file_in.readline()
-            self.tasks_file_name = file_in.readline().strip()
-            file_in.readline()
-            file_in.readline()
-            self.completed_sound = file_in.readline().strip()
-            colors = []
-            for line in file_in:
-                line = line.strip()
-                if not line:
-                    continue
-                elif line[0].isnumeric():  # check if line contains RGBA values
-                    values = [round(int(value) / 255, 2) for value in line.strip().split(",")]
-                    values.append(1)
-                    colors.append(values)
-            self.completed_color, self.uncompleted_color, self.important_color, self.text_color, self.overdue_color, self.button_color, self.dropdown_color = colors
+        for name, value in self.settings.load().items():
+            setattr(self, name, value)
+
+    def reload_settings(self, dt):
+        """If the settings file has changed, apply the settings that changed without restarting or
+        rebuilding the task list. Tasks file, storage mode and save mode are only used after a restart."""
+        if not self.settings.has_changed():
+            return
+        changed_settings = self.settings.load()
+        restart_settings = [name for name in changed_settings if name in RESTART_SETTINGS]
+        for name, value in changed_settings.items():
+            if name not in RESTART_SETTINGS:
+                setattr(self, name, value)
+        if "is_instrumented" in changed_settings or "profiled_action" in changed_settings:
+            self.instrumentation.is_enabled = self.is_instrumented
+            self.instrumentation.profiled_action = self.profiled_action
+            self.instrumentation_text = ""
+            self.show_instrumentation()
+        if "autosave_interval" in changed_settings:
+            self.set_up_autosave()
+        if "is_sound_on" in changed_settings or "completed_sound" in changed_settings:
+            if not self.is_sound_on:
+                self.sound_player = None
+            else:
+                if self.sound_player is None:
+                    self.sound_player = SoundPlayer()
+                self.sound_player.load_sound(self.completed_sound)
+        if any(name.endswith("_color") for name in changed_settings):
+            # Colours of displayed task rows are set from their tasks, so every displayed row is restyled
+            self.changed_tasks.update(task for task in self.task_rows if task is not None)
+            self.update_buttons_trigger()
+        if self.settings.invalid_options:
+            self.info_panel_text = self.get_invalid_settings_message()
+        elif restart_settings:
+            self.info_panel_text = "Settings reloaded, restart to use new {}".format(
+                ", ".join(self.settings.get_option(name) for name in restart_settings))
+        else:
+            self.info_panel_text = "Settings reloaded"
+
+    def get_invalid_settings_message(self):
+        """Return a message listing the settings that are not valid."""
+        return "Invalid settings in {}, using defaults for: {}".format(SETTINGS_FILE,
+                                                                       ", ".join(self.settings.invalid_options))
 
     def load_help_content(self):
-        """Read help documentation from file."""
+        """Read help documentation from file in a single read."""
         with open(HELP_FILE, 'r') as help_file:
-            for line in help_file:
-                self.help_label_height += 20
-                self.help_content += line
+            self.help_content = help_file.read()
+        self.help_label_height = 20 * len(self.help_content.splitlines())
 
 
 if __name__ == '__main__':
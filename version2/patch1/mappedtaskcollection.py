@@ -0,0 +1,474 @@
+"""Mapped Task Collection - This class represents a collection of tasks read lazily from a memory-mapped tasks file.
+Opening the tasks file only finds where each line starts and ends. A Task is parsed from its line
+when it is viewed, sorted or changed, and only the most recently used tasks are kept in memory,
+so memory use stays small even for tasks files bigger than memory."""
+
+import locale
+import mmap
+import os
+from array import array
+from collections import OrderedDict
+from threading import Lock, Thread
+from version2.patch1.task import Task
+from version2.patch1.taskcollection import TaskCollection, TASK_BATCH_SIZE, TEMPORARY_FILE_EXTENSION, get_page
+from version2.patch1.taskidindex import TaskIdIndex
+
+# Number of parsed tasks kept in memory, besides tasks that have been added or changed
+MAX_CACHED_TASKS = 2000
+# Tasks files are written in text mode, so they use the default encoding
+FILE_ENCODING = locale.getpreferredencoding(False)
+# Task ID of rows that have been removed, as task IDs start at 1
+REMOVED_TASK_ID = 0
+
+
+class MappedTaskCollection(TaskCollection):
+    """Collection of tasks parsed from a memory-mapped tasks file when they are needed,
+    with the same capabilities as TaskCollection."""
+
+    def __init__(self):
+        """Initialize class, with no tasks file open."""
+        self.file_name = None
+        self.file_in = None
+        self.mapping = None
+        # Held while the mapping is read or replaced, as saving replaces it on another thread
+        self.mapping_lock = Lock()
+        # Where the line of each row starts and ends in the mapping, or -1 for added rows
+        self.starts = array('q')
+        self.ends = array('q')
+        self.number_of_rows = 0
+        self.removed_rows = set()
+        # Tasks that have been added or changed, by row. These are never evicted, as their
+        # lines in the tasks file are out of date.
+        self.changed_tasks = {}
+        # Recently parsed tasks by row, least recently used first
+        self.cached_tasks = OrderedDict()
+        self.rejected_rows = []
+        # Columns filled in when every row is first scanned, so that counting and sorting by
+        # anything but name or subject do not need to parse rows. Rows are scanned on the loading
+        # thread when the tasks file is opened by read_task_batches(), and hidden until they are.
+        self.is_scanned = False
+        self.is_scanning = False
+        self.task_ids = array('q')
+        self.task_id_index = TaskIdIndex()
+        self.priorities = array('i')
+        self.due_ordinals = array('i')
+        self.completed = bytearray()
+        # 1 for each row of a tasks file saved before tasks had IDs, whose line has no ID to copy when saving
+        self.rows_without_ids = bytearray()
+        self.next_task_id = 1
+        self.number_of_uncompleted_tasks = 0
+        # Rows that have not been removed, in sorted order once tasks have been sorted
+        self.order = array('i')
+        self.sort_keys = None
+        self.sort_columns = None
+        self.is_reversed = False
+        self.journal = None
+        self.compaction_thread = None
+        self.is_dirty = False
+
+    def __len__(self):
+        """Return the number of tasks in the collection."""
+        return len(self.order)
+
+    @property
+    def tasks(self):
+        """Return a list of every task, in sorted order. Every task is parsed to make the list."""
+        return list(self.get_sorted_tasks())
+
+    def open_file(self, file_name):
+        """Memory-map a tasks file and find the start and end of each of its lines. A tasks file that
+        does not exist has no lines, and is mapped once tasks are first saved to it."""
+        self.file_name = file_name
+        try:
+            self.file_in = open(file_name, 'rb')
+        except FileNotFoundError:
+            self.file_in = None
+        if self.file_in is not None and os.fstat(self.file_in.fileno()).st_size:
+            self.mapping = mmap.mmap(self.file_in.fileno(), 0, access=mmap.ACCESS_READ)
+            self.starts, self.ends = self.find_lines(self.mapping)
+        self.number_of_rows = len(self.starts)
+        self.order = array('i', range(self.number_of_rows))
+
+    @staticmethod
+    def find_lines(mapping):
+        """Return arrays of where each line of mapping starts and ends, not counting line endings.
+        Blank lines are skipped, and lines are joined while they have an unclosed quoted field."""
+        starts = array('q')
+        ends = array('q')
+        has_quotes = mapping.find(b'"') != -1
+        size = len(mapping)
+        start = 0
+        while start < size:
+            end = mapping.find(b"\n", start)
+            if end == -1:
+                end = size
+            if has_quotes:
+                number_of_quotes = mapping[start:end].count(b'"')
+                while number_of_quotes % 2 and end < size:
+                    next_end = mapping.find(b"\n", end + 1)
+                    if next_end == -1:
+                        next_end = size
+                    number_of_quotes += mapping[end:next_end].count(b'"')
+                    end = next_end
+            line_end = end - 1 if end > start and mapping[end - 1] == ord("\r") else end
+            if line_end > start:
+                starts.append(start)
+                ends.append(line_end)
+            start = end + 1
+        return starts, ends
+
+    def load_tasks(self, file_name):
+        """Open a tasks file and scan every row. Return a list of (line number, row) of the rows
+        that are not valid tasks."""
+        rejected_rows = []
+        for _ in self.read_task_batches(file_name, rejected_rows=rejected_rows):
+            pass
+        self.finish_loading(file_name)
+        return rejected_rows
+
+    def read_task_batches(self, file_name, batch_size=TASK_BATCH_SIZE, rejected_rows=None):
+        """Open a tasks file straight away and return an iterator over no batches, as tasks are only
+        parsed when they are needed. Iterating it scans every row, so the scan is done on the loading
+        thread, and rows are hidden until finish_loading() is called. Rows that are not valid tasks
+        are added to rejected_rows."""
+        self.open_file(file_name)
+        self.rejected_rows = [] if rejected_rows is None else rejected_rows
+        self.is_scanning = True
+        self.order = array('i')
+        return self.read_scanned_batches()
+
+    def read_scanned_batches(self):
+        """Scan every row, yielding no batches."""
+        self.scan_rows()
+        yield from ()
+
+    def finish_loading(self, file_name):
+        """Show the rows scanned on the loading thread."""
+        if self.is_scanning:
+            self.finish_scan()
+
+    def read_line(self, row):
+        """Return the line of the tasks file that row was read from."""
+        with self.mapping_lock:
+            return self.mapping[self.starts[row]:self.ends[row]].decode(FILE_ENCODING)
+
+    def peek_task(self, row):
+        """Return the task in row without adding it to the cache, parsing it if it is not in memory.
+        Raise IndexError or ValueError if the row is not a valid task."""
+        task = self.changed_tasks.get(row) or self.cached_tasks.get(row)
+        if task is None:
+            task = self.parse_task(self.read_line(row))
+            task.row = row
+            if self.is_scanned:
+                task.task_id = self.task_ids[row]
+        return task
+
+    def get_row_task(self, row):
+        """Return the task in row, keeping it in the cache of recently used tasks."""
+        if row in self.changed_tasks:
+            return self.changed_tasks[row]
+        if row in self.cached_tasks:
+            self.cached_tasks.move_to_end(row)
+            return self.cached_tasks[row]
+        task = self.peek_task(row)
+        self.cached_tasks[row] = task
+        if len(self.cached_tasks) > MAX_CACHED_TASKS:
+            self.cached_tasks.popitem(last=False)
+        return task
+
+    def scan(self):
+        """Parse every row once, unless they have been scanned or are being scanned on the loading thread."""
+        if self.is_scanned or self.is_scanning:
+            return
+        self.scan_rows()
+        self.finish_scan()
+
+    def scan_rows(self):
+        """Parse every row, removing rows that are not valid tasks, giving new IDs to rows without one
+        or with an ID that is taken, and filling in the columns, the ID index and the uncompleted count.
+        Rows are only read from the mapping, not through the sorted order, so this can run on the
+        loading thread while rows are hidden."""
+        self.task_ids = array('q', bytes(8 * self.number_of_rows))
+        self.priorities = array('i', bytes(4 * self.number_of_rows))
+        self.due_ordinals = array('i', bytes(4 * self.number_of_rows))
+        self.completed = bytearray(self.number_of_rows)
+        self.rows_without_ids = bytearray(self.number_of_rows)
+        # Line numbers of rejected rows are counted from the previous rejected row
+        line_number = 1
+        line_number_position = 0
+        for row in range(self.number_of_rows):
+            try:
+                task = self.peek_task(row)
+            except (IndexError, ValueError):
+                self.removed_rows.add(row)
+                with self.mapping_lock:
+                    line_number += self.mapping[line_number_position:self.starts[row]].count(b"\n")
+                line_number_position = self.starts[row]
+                self.rejected_rows.append((line_number, self.read_line(row)))
+                continue
+            if task.task_id is None or task.task_id == REMOVED_TASK_ID:
+                self.rows_without_ids[row] = 1
+            else:
+                self.task_ids[row] = task.task_id
+                self.next_task_id = max(self.next_task_id, task.task_id + 1)
+            self.priorities[row] = task.priority
+            self.due_ordinals[row] = task.due_date.ordinal
+            self.completed[row] = task.is_completed
+            if not task.is_completed:
+                self.number_of_uncompleted_tasks += 1
+        # Rows after the first with the same ID are given new IDs
+        task_id_index = TaskIdIndex()
+        for row in task_id_index.add_rows(self.task_ids, [row for row in range(self.number_of_rows)
+                                                          if self.task_ids[row] != REMOVED_TASK_ID]):
+            self.rows_without_ids[row] = 1
+        for row in range(self.number_of_rows):
+            if self.rows_without_ids[row]:
+                self.task_ids[row] = self.next_task_id
+                task_id_index.add(self.next_task_id, row)
+                self.next_task_id += 1
+        self.task_id_index = task_id_index
+
+    def finish_scan(self):
+        """Show every scanned row that is a valid task, forgetting any sorting done while rows were hidden."""
+        for task in self.cached_tasks.values():
+            task.task_id = self.task_ids[task.row]
+        self.order = array('i', [row for row in range(self.number_of_rows) if row not in self.removed_rows])
+        self.sort_keys = None
+        self.sort_columns = None
+        self.is_scanning = False
+        self.is_scanned = True
+
+    def get_task(self, task_id):
+        """Return the task with task_id, or None if there is no such task."""
+        self.scan()
+        row = self.task_id_index.get_row(task_id)
+        return None if row is None else self.get_row_task(row)
+
+    def get_sort_column(self, key):
+        """Return a function that returns the sorting key of the task in a row for attribute key,
+        which only parses the row if the attribute is not stored in a column."""
+        if key == "is_completed":
+            return self.completed.__getitem__
+        if key == "priority":
+            return self.priorities.__getitem__
+        if key == "due_date":
+            return self.due_ordinals.__getitem__
+        return lambda row: getattr(self.peek_task(row), key)
+
+    def get_sort_key(self, row):
+        """Return the key row is sorted by."""
+        get_key1, get_key2 = self.sort_columns
+        return get_key1(row), get_key2(row), self.priorities[row], self.task_ids[row]
+
+    def find_row_position(self, row):
+        """Return the position in the sorted order that row belongs at, only finding the keys of
+        the rows that a binary search compares it with."""
+        key = self.get_sort_key(row)
+        low = 0
+        high = len(self.order)
+        while low < high:
+            middle = (low + high) // 2
+            if key < self.get_sort_key(self.order[middle]):
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def insert_row(self, row):
+        """Add row to the sorted order, or to the end if tasks have not been sorted."""
+        if self.sort_columns is None:
+            self.order.append(row)
+        else:
+            self.order.insert(self.find_row_position(row), row)
+
+    def add_task(self, task=Task()):
+        """Add Task object to the collection."""
+        self.add_tasks([task])
+        self.is_dirty = True
+        if self.journal is not None:
+            self.journal.record("add", self.format_task(task))
+
+    def add_tasks(self, tasks):
+        """Add a list of Task objects to the collection, keeping them in memory as they are not in the tasks file."""
+        self.scan()
+        for task in tasks:
+            if task.task_id is None or task.task_id in self.task_id_index:
+                task.task_id = self.next_task_id
+            self.next_task_id = max(self.next_task_id, task.task_id + 1)
+            task.row = self.number_of_rows
+            self.task_id_index.add(task.task_id, task.row)
+            self.number_of_rows += 1
+            self.starts.append(-1)
+            self.ends.append(-1)
+            self.task_ids.append(task.task_id)
+            self.priorities.append(task.priority)
+            self.due_ordinals.append(task.due_date.ordinal)
+            self.completed.append(task.is_completed)
+            self.rows_without_ids.append(0)
+            self.changed_tasks[task.row] = task
+            if not task.is_completed:
+                self.number_of_uncompleted_tasks += 1
+            self.insert_row(task.row)
+
+    def is_task_in_collection(self, task):
+        """Return True if task is a task of this collection that has not been removed."""
+        row = getattr(task, "row", None)
+        return (row is not None and row < self.number_of_rows and row not in self.removed_rows and
+                self.task_ids[row] == task.task_id)
+
+    def remove_task(self, task=Task()):
+        """Remove Task object from the collection and return the task that was removed."""
+        self.scan()
+        if self.is_task_in_collection(task):
+            self.remove_rows([task.row])
+            if self.journal is not None:
+                self.journal.record("remove", task.task_id)
+            return str(task) + " removed."
+
+    def remove_completed_tasks(self):
+        """Remove all completed tasks in a single pass, without parsing them, and return the number
+        of tasks removed."""
+        self.scan()
+        removed_rows = [row for row in self.order if self.completed[row]]
+        if removed_rows:
+            if self.journal is not None:
+                for row in removed_rows:
+                    self.journal.record("remove", self.task_ids[row])
+            self.remove_rows(removed_rows)
+        return len(removed_rows)
+
+    def remove_rows(self, rows):
+        """Remove rows from the collection, in a single pass over the sorted order."""
+        for row in rows:
+            if not self.completed[row]:
+                self.number_of_uncompleted_tasks -= 1
+            self.task_ids[row] = REMOVED_TASK_ID
+            self.changed_tasks.pop(row, None)
+            self.cached_tasks.pop(row, None)
+        self.removed_rows.update(rows)
+        self.task_id_index.remove_rows(self.removed_rows)
+        self.order = array('i', [row for row in self.order if row not in self.removed_rows])
+        self.is_dirty = True
+
+    def update_task(self, task, change, *args):
+        """Call change with args to change task, keep it in memory as its line is now out of date,
+        then move it to its new place in the sorted order."""
+        self.order.remove(task.row)
+        change(*args)
+        self.number_of_uncompleted_tasks += self.completed[task.row] - task.is_completed
+        self.priorities[task.row] = task.priority
+        self.completed[task.row] = task.is_completed
+        self.cached_tasks.pop(task.row, None)
+        self.changed_tasks[task.row] = task
+        self.insert_row(task.row)
+        self.is_dirty = True
+
+    def get_num_of_uncompleted_tasks(self):
+        """Return the number of uncompleted tasks."""
+        self.scan()
+        return self.number_of_uncompleted_tasks
+
+    def get_sorted_tasks(self):
+        """Return an iterator over tasks in sorted order, taking reversed sorting into account.
+        Tasks are parsed as the iterator reaches them."""
+        self.scan()
+        return map(self.get_row_task, reversed(self.order) if self.is_reversed else self.order)
+
+    def get_sorted_rows(self, offset=0, limit=-1):
+        """Return a page of rows in sorted order, taking reversed sorting into account, without
+        parsing them. Rows are parsed by get_row_task() when they are displayed.
+        offset and limit select the page, with a limit of -1 selecting every row after offset."""
+        self.scan()
+        return get_page(self.order, self.is_reversed, offset, limit)
+
+    def sort_tasks(self, key1="is_completed", key2="due_date", is_reversed=False):
+        """Sort rows by passed in key first, then by priority. Rows are sorted in full when the keys
+        change, which parses every row when sorting by name or subject, after which rows are kept
+        sorted as tasks change."""
+        self.scan()
+        if self.sort_keys != (key1, key2):
+            self.sort_columns = (self.get_sort_column(key1), self.get_sort_column(key2))
+            self.order = array('i', sorted(self.order, key=self.get_sort_key))
+            self.sort_keys = (key1, key2)
+        self.is_reversed = is_reversed
+
+    def snapshot_tasks(self):
+        """Return the rows to save in order and the tasks that have been added or changed, and mark
+        the collection and its changed tasks as saved, so tasks can be saved on another thread while
+        changes continue."""
+        self.scan()
+        self.is_dirty = False
+        for task in self.changed_tasks.values():
+            task.is_dirty = False
+        return array('i', self.order), dict(self.changed_tasks)
+
+    def save_tasks(self, file_name, tasks=None):
+        """Write all tasks to a file, copying the lines of tasks that have not changed rather than
+        parsing them. Any journal records are then no longer needed.
+        tasks is a snapshot of the tasks to write when saving on another thread."""
+        self.wait_for_compaction()
+        if tasks is None:
+            tasks = self.snapshot_tasks()
+        self.write_rows(file_name, *tasks)
+        if self.journal is not None:
+            self.journal.clear()
+
+    def compact_journal(self, file_name):
+        """Write all tasks to file_name on a background thread, then delete the journal records
+        that the file now contains. Changes made meanwhile are recorded to a new journal."""
+        if self.compaction_thread is not None and self.compaction_thread.is_alive():
+            return
+        rows, changed_tasks = self.snapshot_tasks()
+        self.journal.rotate()
+        self.compaction_thread = Thread(target=self.write_compacted_rows, args=(file_name, rows, changed_tasks))
+        self.compaction_thread.start()
+
+    def write_compacted_rows(self, file_name, rows, changed_tasks):
+        """Write rows to file_name, then delete the journal's old records."""
+        self.write_rows(file_name, rows, changed_tasks)
+        self.journal.discard_old_records()
+
+    def write_rows(self, file_name, rows, changed_tasks):
+        """Write the lines of rows to a temporary file, then rename it to file_name. If file_name is
+        the mapped tasks file, the new file is mapped in its place, with each written row's line
+        moved to where it was written."""
+        temporary_file_name = file_name + TEMPORARY_FILE_EXTENSION
+        line_ending = os.linesep.encode()
+        new_starts = array('q')
+        new_ends = array('q')
+        position = 0
+        with open(temporary_file_name, 'wb') as file_out:
+            for row in rows:
+                if row in changed_tasks:
+                    line = self.format_task(changed_tasks[row]).encode(FILE_ENCODING)
+                elif self.rows_without_ids[row]:
+                    line = self.format_task(self.peek_task(row)).encode(FILE_ENCODING)
+                else:
+                    with self.mapping_lock:
+                        line = self.mapping[self.starts[row]:self.ends[row]]
+                new_starts.append(position)
+                new_ends.append(position + len(line))
+                file_out.write(line)
+                file_out.write(line_ending)
+                position += len(line) + len(line_ending)
+            file_out.flush()
+            os.fsync(file_out.fileno())
+        if self.file_name is None or os.path.abspath(file_name) != os.path.abspath(self.file_name):
+            os.replace(temporary_file_name, file_name)
+            return
+        with self.mapping_lock:
+            # Some systems cannot replace a file that is mapped, so the old mapping is closed first
+            if self.mapping is not None:
+                self.mapping.close()
+            if self.file_in is not None:
+                self.file_in.close()
+            os.replace(temporary_file_name, file_name)
+            self.file_in = open(file_name, 'rb')
+            self.mapping = None
+            if position:
+                self.mapping = mmap.mmap(self.file_in.fileno(), 0, access=mmap.ACCESS_READ)
+            for row, start, end in zip(rows, new_starts, new_ends):
+                self.starts[row] = start
+                self.ends[row] = end
+            # Every row that was written now has its ID in the tasks file
+            self.rows_without_ids = bytearray(len(self.rows_without_ids))
@@ -0,0 +1,186 @@
+"""Settings - This class reads TaskTracker's settings from an INI file using configparser.
+Every setting is parsed and validated against SETTINGS_SCHEMA once, when the file is read, so
+colours are turned into RGBA values only once and a bad value falls back to its default instead
+of crashing TaskTracker. The file's modification time is kept so it can be reloaded when it changes.
+If the file does not exist, settings are read once from the settings.txt of older versions, which
+the file is then written from, or every setting falls back to its default."""
+
+import configparser
+import os
+
+TASK_STORAGE_MODES = ("list", "columnar", "snapshot", "mapped", "sqlite")
+SAVE_MODES = ("file", "journal")
+PROFILED_ACTIONS = ("none", "refresh_buttons", "sort_tasks", "load_tasks", "save_tasks", "play_sound",
+                    "mark_completed_or_uncompleted", "startup")
+
+
+def parse_text(value):
+    """Return value if it is not empty."""
+    if not value:
+        raise ValueError("must not be empty")
+    return value
+
+
+def parse_switch(value):
+    """Return True if value is "on" and False if it is "off"."""
+    if value not in ("on", "off"):
+        raise ValueError("must be on or off")
+    return value == "on"
+
+
+def parse_seconds(value):
+    """Return value as a number of seconds, which must not be negative."""
+    seconds = float(value)
+    if seconds < 0:
+        raise ValueError("must be 0 or more")
+    return seconds
+
+
+def parse_colour(value):
+    """Return the RGBA values from 0 to 1 of a colour written as red, green and blue values from 0 to 255.
+    A list is returned, as Kivy's ListProperty only accepts lists."""
+    values = [int(part) for part in value.split(",")]
+    if len(values) != 3 or not all(0 <= part <= 255 for part in values):
+        raise ValueError("must be 3 values from 0 to 255")
+    return [round(part / 255, 2) for part in values] + [1]
+
+
+def get_choice_parser(choices):
+    """Return a parser of values that must be one of choices."""
+    def parse_choice(value):
+        """Return value if it is one of the choices."""
+        if value not in choices:
+            raise ValueError("must be one of {}".format(", ".join(choices)))
+        return value
+    return parse_choice
+
+
+# Section, option, parser and default value of each setting, by the name of the app attribute it sets
+SETTINGS_SCHEMA = {
+    "tasks_file_name": ("Files", "tasks_file", parse_text, "tasks.csv"),
+    "completed_sound": ("Files", "sound_file", parse_text, "trumpet.wav"),
+    "task_storage_mode": ("Tasks", "storage_mode", get_choice_parser(TASK_STORAGE_MODES), "list"),
+    "save_mode": ("Tasks", "save_mode", get_choice_parser(SAVE_MODES), "file"),
+    "autosave_interval": ("Tasks", "autosave_interval", parse_seconds, "30"),
+    "is_sound_on": ("Sound", "sound", parse_switch, "on"),
+    "is_instrumented": ("Instrumentation", "instrumentation", parse_switch, "off"),
+    "profiled_action": ("Instrumentation", "profiled_action", get_choice_parser(PROFILED_ACTIONS), "none"),
+    "completed_color": ("Colours", "completed", parse_colour, "50, 50, 50"),
+    "uncompleted_color": ("Colours", "uncompleted", parse_colour, "0, 50, 80"),
+    "important_color": ("Colours", "important", parse_colour, "0, 80, 120"),
+    "text_color": ("Colours", "text", parse_colour, "255, 255, 255"),
+    "overdue_color": ("Colours", "overdue", parse_colour, "255, 0, 0"),
+    "button_color": ("Colours", "button", parse_colour, "10, 17, 40"),
+    "dropdown_color": ("Colours", "dropdown", parse_colour, "0, 142, 200"),
+}
+
+
+# Setting set by each labelled value of the settings.txt of older versions, by the label's text
+# before any description in brackets
+LEGACY_SETTINGS_LABELS = {
+    "Tasks file location": "tasks_file_name",
+    "Sound file location": "completed_sound",
+    "Task storage mode": "task_storage_mode",
+    "Save mode": "save_mode",
+    "Instrumentation": "is_instrumented",
+    "Profiled action": "profiled_action",
+    "Autosave interval": "autosave_interval",
+    "Sound": "is_sound_on",
+    "Completed task colour": "completed_color",
+    "Uncompleted task colour": "uncompleted_color",
+    "Important task colour": "important_color",
+    "Text colour": "text_color",
+    "Overdue text colour": "overdue_color",
+    "Button colour": "button_color",
+    "Drop-down colour": "dropdown_color",
+}
+
+
+def read_legacy_settings(file_name):
+    """Return the values of a settings.txt of older versions by section and option, where each value
+    is on the line after a label ending in a colon."""
+    with open(file_name, 'r') as file_in:
+        lines = [line.strip() for line in file_in]
+    values = {}
+    for label, value in zip(lines, lines[1:]):
+        name = LEGACY_SETTINGS_LABELS.get(label.split(" (")[0].rstrip(":"))
+        if name is not None and label.endswith(":"):
+            section, option, _, _ = SETTINGS_SCHEMA[name]
+            values.setdefault(section, {})[option] = value
+    return values
+
+
+class Settings:
+    """Validated settings read from an INI file, which can be reloaded when the file changes."""
+
+    def __init__(self, file_name, legacy_file_name=None):
+        """Initialize Settings class, setting the file settings are read from, and the settings.txt
+        of older versions that they are read from if that file does not exist."""
+        self.file_name = file_name
+        self.legacy_file_name = legacy_file_name
+        self.values = {}
+        # Options that are not valid, which their default values are used for
+        self.invalid_options = []
+        # Where settings were read from if the settings file did not exist
+        self.message = None
+        self.modification_time = None
+
+    def load(self):
+        """Read and validate every setting, returning a dictionary of the settings whose values
+        have changed since the file was last read, by the name of the app attribute they set."""
+        parser = configparser.ConfigParser(interpolation=None)
+        self.invalid_options = []
+        self.message = None
+        if not os.path.exists(self.file_name):
+            self.read_legacy_settings(parser)
+        try:
+            self.modification_time = os.path.getmtime(self.file_name)
+            with open(self.file_name, 'r') as file_in:
+                parser.read_file(file_in)
+        except OSError:
+            # Every setting falls back to its default
+            self.modification_time = None
+            if self.message is None:
+                self.message = "{} was not found, using default settings".format(self.file_name)
+        except configparser.Error:
+            # Every setting falls back to its default
+            self.invalid_options.append(self.file_name)
+            parser = configparser.ConfigParser(interpolation=None)
+        values = {}
+        for name, (section, option, parse, default) in SETTINGS_SCHEMA.items():
+            try:
+                values[name] = parse(parser.get(section, option, fallback=default).strip())
+            except ValueError:
+                self.invalid_options.append(option)
+                values[name] = parse(default)
+        changed_values = {name: value for name, value in values.items()
+                          if name not in self.values or self.values[name] != value}
+        self.values = values
+        return changed_values
+
+    def read_legacy_settings(self, parser):
+        """Read the settings.txt of older versions into parser, if there is one, and write the settings
+        file from it so that it is only read once."""
+        if self.legacy_file_name is None or not os.path.exists(self.legacy_file_name):
+            return
+        try:
+            parser.read_dict(read_legacy_settings(self.legacy_file_name))
+            with open(self.file_name, 'w') as file_out:
+                parser.write(file_out)
+        except OSError as error:
+            self.message = "Could not move settings from {} to {} ({})".format(
+                self.legacy_file_name, self.file_name, error)
+        else:
+            self.message = "Settings moved from {} to {}".format(self.legacy_file_name, self.file_name)
+
+    def has_changed(self):
+        """Return True if the settings file has been modified since it was last read."""
+        try:
+            return os.path.getmtime(self.file_name) != self.modification_time
+        except OSError:
+            return False
+
+    @staticmethod
+    def get_option(name):
+        """Return the option in the settings file of the setting that sets app attribute name."""
+        return SETTINGS_SCHEMA[name][1]
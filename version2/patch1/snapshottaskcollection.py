@@ -0,0 +1,123 @@
+"""Snapshot Task Collection - This class represents a columnar collection of tasks that is also
+saved as a binary snapshot next to the tasks file. The snapshot holds the string table and the
+columns as fixed-width integers, so opening it is a few memory copies rather than parsing text.
+The snapshot is rebuilt from the tasks file whenever the tasks file is newer."""
+
+import mmap
+import os
+import struct
+from array import array
+from version2.patch1.columnartaskcollection import ColumnarTaskCollection
+from version2.patch1.taskcollection import TaskCollection, TASK_BATCH_SIZE, TEMPORARY_FILE_EXTENSION
+
+SNAPSHOT_EXTENSION = ".snapshot"
+SNAPSHOT_MAGIC = b"TTS1"
+# Magic, number of rows, number of strings and length of the string table in bytes
+SNAPSHOT_HEADER = struct.Struct("<4sIII")
+# Strings in the string table are separated by a character tasks cannot contain
+STRING_SEPARATOR = "\0"
+COLUMN_NAMES = ("task_ids", "names", "subjects", "priorities", "due_dates")
+
+
+class SnapshotTaskCollection(ColumnarTaskCollection):
+    """Columnar collection of tasks that loads from and saves to a binary snapshot of the tasks file."""
+
+    def __init__(self):
+        """Initialize class, create empty columns."""
+        self._string_codes = None
+        super().__init__()
+        self.snapshot_is_current = False
+
+    @property
+    def string_codes(self):
+        """Return the code of each string in the string table, only building them the first time they are needed."""
+        if self._string_codes is None:
+            self._string_codes = dict(zip(self.strings, range(len(self.strings))))
+        return self._string_codes
+
+    @string_codes.setter
+    def string_codes(self, string_codes):
+        """Set the code of each string, or None to build them from the string table when they are needed."""
+        self._string_codes = string_codes
+
+    def read_task_batches(self, file_name, batch_size=TASK_BATCH_SIZE, rejected_rows=None):
+        """Return an iterator over batches of tasks read from a CSV file. If the snapshot is current,
+        the columns are read from the snapshot straight away instead, and there are no batches.
+        The snapshot is never current if there is no tasks file, as then there are no tasks."""
+        snapshot_file_name = file_name + SNAPSHOT_EXTENSION
+        self.snapshot_is_current = (os.path.exists(snapshot_file_name) and os.path.exists(file_name) and
+                                    os.path.getmtime(snapshot_file_name) >= os.path.getmtime(file_name) and
+                                    self.read_snapshot(snapshot_file_name))
+        if self.snapshot_is_current:
+            return iter(())
+        return TaskCollection.read_task_batches(file_name, batch_size, rejected_rows)
+
+    def finish_loading(self, file_name):
+        """Rebuild the snapshot if the tasks were read from the tasks file."""
+        if not self.snapshot_is_current:
+            self.write_snapshot(file_name, range(self.number_of_rows))
+            self.snapshot_is_current = True
+
+    def save_tasks(self, file_name, tasks=None):
+        """Write all tasks to a file, then write the snapshot so that it is newer than the file."""
+        if tasks is None:
+            tasks = self.snapshot_tasks()
+        super().save_tasks(file_name, tasks)
+        self.write_snapshot(file_name, [task.row for task in tasks])
+
+    def read_snapshot(self, snapshot_file_name):
+        """Replace the columns with the columns of a snapshot file.
+        Return False if the file is not a snapshot or is incomplete."""
+        with open(snapshot_file_name, 'rb') as file_in:
+            if os.fstat(file_in.fileno()).st_size < SNAPSHOT_HEADER.size:
+                return False
+            with mmap.mmap(file_in.fileno(), 0, access=mmap.ACCESS_READ) as snapshot:
+                magic, number_of_rows, number_of_strings, strings_length = SNAPSHOT_HEADER.unpack_from(snapshot)
+                column_length = number_of_rows * array('i').itemsize
+                completed_length = (number_of_rows + 7) // 8
+                if magic != SNAPSHOT_MAGIC or len(snapshot) != (SNAPSHOT_HEADER.size + strings_length +
+                                                                len(COLUMN_NAMES) * column_length + completed_length):
+                    return False
+                position = SNAPSHOT_HEADER.size
+                self.strings = []
+                if number_of_strings:
+                    self.strings = snapshot[position:position + strings_length].decode().split(STRING_SEPARATOR)
+                position += strings_length
+                for column_name in COLUMN_NAMES:
+                    column = array('i')
+                    column.frombytes(snapshot[position:position + column_length])
+                    setattr(self, column_name, column)
+                    position += column_length
+                self.completed = bytearray(snapshot[position:position + completed_length])
+        # Indexes of the string table and task IDs are built when a task is first looked up or added
+        self.string_codes = None
+        self._task_id_index = None
+        self.next_task_id = max(self.task_ids, default=0) + 1
+        self.number_of_rows = number_of_rows
+        self.removed_rows = set()
+        self.order = array('i', range(number_of_rows))
+        self.order_is_sorted = False
+        return True
+
+    def write_snapshot(self, file_name, rows):
+        """Write the tasks in rows to the snapshot of tasks file file_name. No snapshot is written
+        if a string contains the string separator, and the tasks file is read instead next time."""
+        strings = list(self.strings)
+        if any(STRING_SEPARATOR in string for string in strings):
+            return
+        strings_bytes = STRING_SEPARATOR.join(strings).encode()
+        rows = list(rows)
+        completed = bytearray((len(rows) + 7) // 8)
+        for index, row in enumerate(rows):
+            if self.is_row_completed(row):
+                completed[index >> 3] |= 1 << (index & 7)
+        snapshot_file_name = file_name + SNAPSHOT_EXTENSION
+        temporary_file_name = snapshot_file_name + TEMPORARY_FILE_EXTENSION
+        with open(temporary_file_name, 'wb') as file_out:
+            file_out.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, len(rows), len(strings), len(strings_bytes)))
+            file_out.write(strings_bytes)
+            for column_name in COLUMN_NAMES:
+                column = getattr(self, column_name)
+                file_out.write(array('i', [column[row] for row in rows]).tobytes())
+            file_out.write(completed)
+        os.replace(temporary_file_name, snapshot_file_name)
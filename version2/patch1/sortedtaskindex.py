@@ -0,0 +1,64 @@
+"""Sorted Task Index - This class keeps a list of tasks sorted by a key.
+Tasks are added, removed and moved one at a time using binary search instead of re-sorting."""
+
+from bisect import bisect_left, bisect_right
+
+
+class SortedTaskIndex:
+    """List of tasks kept sorted by get_key, alongside a list of each task's key."""
+
+    def __init__(self, get_key, tasks=()):
+        """Initialize SortedTaskIndex class, sorting tasks passed in."""
+        self.get_key = get_key
+        self.keys = []
+        self.tasks = []
+        tasks = list(tasks)
+        self.set_tasks(tasks, list(map(get_key, tasks)))
+
+    def __len__(self):
+        """Return the number of tasks in the index."""
+        return len(self.tasks)
+
+    def add_task(self, task):
+        """Insert task after any tasks with an equal key."""
+        key = self.get_key(task)
+        position = bisect_right(self.keys, key)
+        self.keys.insert(position, key)
+        self.tasks.insert(position, task)
+
+    def set_tasks(self, tasks, keys):
+        """Replace the tasks with a list of tasks and a list of their keys, sorting the positions of
+        the keys rather than (key, task) pairs so that no pairs are built or compared."""
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.keys[:] = [keys[position] for position in order]
+        self.tasks[:] = [tasks[position] for position in order]
+
+    def add_tasks(self, tasks):
+        """Add a list of tasks, re-sorting once instead of inserting them one at a time."""
+        self.set_tasks(self.tasks + tasks, self.keys + list(map(self.get_key, tasks)))
+
+    def find_task(self, task):
+        """Return the position of task, or -1 if it is not in the index.
+        Must be called before the task's key attributes are changed."""
+        key = self.get_key(task)
+        position = bisect_left(self.keys, key)
+        while position < len(self.keys) and self.keys[position] == key:
+            if self.tasks[position] is task:
+                return position
+            position += 1
+        return -1
+
+    def remove_task(self, task):
+        """Remove task, returning True if it was in the index."""
+        position = self.find_task(task)
+        if position == -1:
+            return False
+        del self.keys[position]
+        del self.tasks[position]
+        return True
+
+    def remove_tasks_where(self, should_remove):
+        """Remove every task for which should_remove returns True, in a single pass."""
+        kept_tasks = [(key, task) for key, task in zip(self.keys, self.tasks) if not should_remove(task)]
+        self.keys[:] = [key for key, task in kept_tasks]
+        self.tasks[:] = [task for key, task in kept_tasks]
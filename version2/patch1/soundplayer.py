@@ -0,0 +1,81 @@
+"""Sound Player - This class plays sound files through a pool of pygame mixer channels.
+Each sound file is decoded once on a background thread and the decoded sound is reused every
+time it is played, so playing a sound never reads a file on the main thread or waits for it to finish.
+pygame is only imported, and only its mixer initialized, when the first sound is decoded."""
+
+from threading import Lock, Thread
+
+# Number of channels sounds are played on, so a sound can start before the last one has finished
+NUMBER_OF_CHANNELS = 8
+
+
+class SoundPlayer:
+    """Cache of decoded sounds, which are played on whichever channel of the pool is free."""
+
+    def __init__(self, number_of_channels=NUMBER_OF_CHANNELS):
+        """Initialize SoundPlayer class, which will play sounds on number_of_channels mixer channels."""
+        self.number_of_channels = number_of_channels
+        self.mixer = None
+        self.mixer_lock = Lock()
+        # Decoded sound, or the error decoding it, of each sound file
+        self.sounds = {}
+        self.loading_threads = {}
+        # Sound files played while they were still being decoded, to play once they are decoded
+        self.waiting_sounds = set()
+        self.lock = Lock()
+
+    def get_mixer(self):
+        """Return pygame's mixer, importing pygame and initializing only the mixer the first time."""
+        with self.mixer_lock:
+            if self.mixer is None:
+                import pygame
+                pygame.mixer.init()
+                pygame.mixer.set_num_channels(self.number_of_channels)
+                self.mixer = pygame.mixer
+            return self.mixer
+
+    def load_sound(self, file_name):
+        """Start decoding file_name on a background thread, unless it is decoded or being decoded already."""
+        with self.lock:
+            if file_name in self.sounds or file_name in self.loading_threads:
+                return
+            loading_thread = Thread(target=self.decode_sound, args=(file_name,), daemon=True)
+            self.loading_threads[file_name] = loading_thread
+        loading_thread.start()
+
+    def decode_sound(self, file_name):
+        """Decode file_name and keep the sound, or the error decoding it, then play it if it was
+        played while it was being decoded. Run on a background thread."""
+        try:
+            sound = self.get_mixer().Sound(file_name)
+        # pygame.error is a RuntimeError
+        except (ImportError, RuntimeError, OSError) as error:
+            sound = error
+        with self.lock:
+            self.sounds[file_name] = sound
+            del self.loading_threads[file_name]
+            is_waiting = file_name in self.waiting_sounds
+            self.waiting_sounds.discard(file_name)
+        if is_waiting and not isinstance(sound, Exception):
+            self.play_on_free_channel(sound)
+
+    def play(self, file_name):
+        """Play file_name without waiting for it to finish. If it has not been decoded yet, it is
+        played once it is. Raise the error decoding it if it could not be decoded."""
+        with self.lock:
+            sound = self.sounds.get(file_name)
+            if sound is None:
+                self.waiting_sounds.add(file_name)
+        if sound is None:
+            self.load_sound(file_name)
+        elif isinstance(sound, Exception):
+            raise sound
+        else:
+            self.play_on_free_channel(sound)
+
+    def play_on_free_channel(self, sound):
+        """Play sound on a channel that is not playing, or on the channel that has been playing
+        longest if every channel is busy, so rapidly played sounds never wait for each other."""
+        channel = self.mixer.find_channel(True)
+        if channel is not None:
+            channel.play(sound)
@@ -0,0 +1,212 @@
+"""SQLite Task Collection - This class represents a collection of tasks stored in an SQLite database.
+Tasks are kept in a database file next to the tasks file rather than in memory, and sorting and
+counting are done by indexed queries. Loading and saving tasks still import and export CSV files."""
+
+import os
+import sqlite3
+from version2.patch1.task import Task
+from version2.patch1.date import get_date
+from version2.patch1.taskcollection import TaskCollection, TASK_BATCH_SIZE
+
+DATABASE_EXTENSION = ".sqlite"
+SORT_KEYS_TO_COLUMNS = {"is_completed": "is_completed", "priority": "priority", "name": "name",
+                        "subject": "subject", "due_date": "due_ordinal"}
+TASK_COLUMNS = "name, subject, priority, due_date, is_completed, task_id"
+# User version of a database whose import of the tasks file finished, so a database left with only
+# some of the tasks (e.g. TaskTracker was closed while importing) is imported again
+IMPORT_COMPLETE_VERSION = 1
+
+
+class SQLiteTaskCollection(TaskCollection):
+    """Collection of tasks stored in an SQLite database, with the same capabilities as TaskCollection."""
+
+    def __init__(self):
+        """Initialize class, create an in-memory database until a database file is opened."""
+        self.connection = None
+        self.database_is_current = False
+        self.order_by = "priority, task_id"
+        self.is_reversed = False
+        self.journal = None
+        self.compaction_thread = None
+        # Tasks of the last page of sorted rows by ID, so that showing the page does not query each
+        # of its tasks again. Each task's Task is reused while it is on the page, so it is never out of date.
+        self.page_tasks = {}
+        # Every change is written to the database as it is made
+        self.is_dirty = False
+        self.connect(":memory:")
+
+    def __len__(self):
+        """Return the number of tasks in the collection."""
+        return self.connection.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    @property
+    def tasks(self):
+        """Return a list of every task, in sorted order."""
+        return list(self.query_tasks("ORDER BY " + self.order_by))
+
+    def connect(self, database_file_name):
+        """Connect to a database file, creating the tasks table and its indexes if they do not exist."""
+        if self.connection is not None:
+            self.connection.close()
+        self.connection = sqlite3.connect(database_file_name)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                due_date TEXT NOT NULL,
+                due_ordinal INTEGER NOT NULL,
+                is_completed INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS tasks_by_priority ON tasks (priority);
+            CREATE INDEX IF NOT EXISTS tasks_by_due_date ON tasks (due_ordinal, priority);
+            CREATE INDEX IF NOT EXISTS tasks_by_subject ON tasks (subject, priority);
+            CREATE INDEX IF NOT EXISTS tasks_by_completion ON tasks (is_completed, due_ordinal);
+        """)
+
+    def open_database(self, file_name):
+        """Open the database of tasks file file_name. The database is current if its import finished
+        and it was saved after the tasks file was last changed, in which case the tasks file does not
+        need to be read."""
+        database_file_name = file_name + DATABASE_EXTENSION
+        # A database with no tasks file is current, as its tasks are the only copy of them
+        is_newer = (os.path.exists(database_file_name) and
+                    (not os.path.exists(file_name) or
+                     os.path.getmtime(database_file_name) >= os.path.getmtime(file_name)))
+        self.connect(database_file_name)
+        user_version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        self.database_is_current = is_newer and user_version == IMPORT_COMPLETE_VERSION
+
+    def close(self):
+        """Commit any changes and close the database."""
+        self.connection.commit()
+        self.connection.close()
+
+    def query_tasks(self, clauses="", parameters=()):
+        """Yield a Task for each row selected by the SQL clauses passed in."""
+        for row in self.connection.execute("SELECT {} FROM tasks {}".format(TASK_COLUMNS, clauses), parameters):
+            yield Task(row[0], row[1], row[2], row[3], bool(row[4]), row[5])
+
+    def load_tasks(self, file_name):
+        """Import tasks from a CSV file. Return a list of (line number, row) of the rows that are not valid tasks."""
+        rejected_rows = []
+        for batch in TaskCollection.read_task_batches(file_name, rejected_rows=rejected_rows):
+            self.add_tasks(batch)
+        self.finish_loading(file_name)
+        return rejected_rows
+
+    def read_task_batches(self, file_name, batch_size=TASK_BATCH_SIZE, rejected_rows=None):
+        """Return an iterator over batches of tasks read from a CSV file, replacing the tasks in the
+        database. Nothing is read if the database is current. The database is cleared straight away
+        rather than when the batches are read, so the batches can be read on another thread. It is
+        marked as incomplete until finish_loading() is called once every batch has been added."""
+        if self.database_is_current:
+            return iter(())
+        self.page_tasks = {}
+        with self.connection:
+            self.connection.execute("DELETE FROM tasks")
+            self.connection.execute("PRAGMA user_version = 0")
+        return TaskCollection.read_task_batches(file_name, batch_size, rejected_rows)
+
+    def finish_loading(self, file_name):
+        """Mark the database as a complete import of the tasks file."""
+        if not self.database_is_current:
+            with self.connection:
+                self.connection.execute("PRAGMA user_version = {}".format(IMPORT_COMPLETE_VERSION))
+            self.database_is_current = True
+
+    def save_tasks(self, file_name, tasks=None):
+        """Export all tasks, or a snapshot of tasks, to a CSV file."""
+        if tasks is None:
+            tasks = self.query_tasks("ORDER BY " + self.order_by)
+        self.write_lines(file_name, (self.format_task(task) for task in tasks))
+
+    def add_task(self, task=Task()):
+        """Add Task object to the database."""
+        self.add_tasks([task])
+
+    def add_tasks(self, tasks):
+        """Add a list of Task objects to the database in a single transaction.
+        Tasks with no ID or an ID that is taken are given a new ID."""
+        with self.connection:
+            for task in tasks:
+                values = [task.name, task.subject, task.priority, task.due_date_string, get_date(task.due_date_string).ordinal,
+                          task.is_completed]
+                try:
+                    cursor = self.connection.execute(
+                        "INSERT INTO tasks (name, subject, priority, due_date, due_ordinal, is_completed, task_id) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)", values + [task.task_id])
+                except sqlite3.IntegrityError:
+                    cursor = self.connection.execute(
+                        "INSERT INTO tasks (name, subject, priority, due_date, due_ordinal, is_completed) "
+                        "VALUES (?, ?, ?, ?, ?, ?)", values)
+                task.task_id = cursor.lastrowid
+
+    def get_task(self, task_id):
+        """Return the task with task_id, or None if there is no such task."""
+        task = self.page_tasks.get(task_id)
+        if task is None:
+            task = next(self.query_tasks("WHERE task_id = ?", (task_id,)), None)
+        return task
+
+    def remove_task(self, task=Task()):
+        """Remove Task object from the database and return the task that was removed."""
+        with self.connection:
+            cursor = self.connection.execute("DELETE FROM tasks WHERE task_id = ?", (task.task_id,))
+        self.page_tasks.pop(task.task_id, None)
+        if cursor.rowcount:
+            return str(task) + " removed."
+
+    def remove_completed_tasks(self):
+        """Remove all completed tasks with a single query, without reading them, and return the
+        number of tasks removed."""
+        with self.connection:
+            cursor = self.connection.execute("DELETE FROM tasks WHERE is_completed = 1")
+        self.page_tasks = {task_id: task for task_id, task in self.page_tasks.items() if not task.is_completed}
+        return cursor.rowcount
+
+    def update_task(self, task, change, *args):
+        """Call change with args to change task, then write the changed task to the database."""
+        change(*args)
+        with self.connection:
+            self.connection.execute("UPDATE tasks SET priority = ?, is_completed = ? WHERE task_id = ?",
+                                    (task.priority, task.is_completed, task.task_id))
+
+    def get_num_of_uncompleted_tasks(self):
+        """Return the number of uncompleted tasks in the database."""
+        return self.connection.execute("SELECT COUNT(*) FROM tasks WHERE is_completed = 0").fetchone()[0]
+
+    def get_sorted_tasks(self, offset=0, limit=-1):
+        """Return an iterator over tasks in sorted order, taking reversed sorting into account.
+        offset and limit select a page of tasks, with a limit of -1 selecting every task after offset."""
+        return self.query_tasks("ORDER BY {} LIMIT ? OFFSET ?".format(self.get_order_by()), (limit, offset))
+
+    def get_sorted_rows(self, offset=0, limit=-1):
+        """Return a page of the rows of tasks in sorted order, taking reversed sorting into account,
+        with a single query. The row of a task is its ID. offset and limit select the page, with a
+        limit of -1 selecting every row after offset. The page's tasks are kept for get_row_task()."""
+        page_tasks = {}
+        for task in self.get_sorted_tasks(offset, limit):
+            page_tasks[task.task_id] = self.page_tasks.get(task.task_id, task)
+        self.page_tasks = page_tasks
+        return list(page_tasks)
+
+    def get_row_task(self, row):
+        """Return the task in row, as returned by get_sorted_rows()."""
+        return self.get_task(row)
+
+    def get_order_by(self):
+        """Return the columns tasks are ordered by, taking reversed sorting into account."""
+        if self.is_reversed:
+            return ", ".join(column + " DESC" for column in self.order_by.split(", "))
+        return self.order_by
+
+    def sort_tasks(self, key1="is_completed", key2="due_date", is_reversed=False):
+        """Set the order tasks are queried in to passed in key first, then priority."""
+        columns = []
+        for column in (SORT_KEYS_TO_COLUMNS[key1], SORT_KEYS_TO_COLUMNS[key2], "priority", "task_id"):
+            if column not in columns:
+                columns.append(column)
+        self.order_by = ", ".join(columns)
+        self.is_reversed = is_reversed
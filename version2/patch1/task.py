@@ -1,20 +1,24 @@
 """Task - This class represents a task with a name, subject, priority, and a boolean
 for whether or not the task has been competed."""
 
-from version2.patch1.date import Date
-from datetime import datetime
+from version2.patch1.date import get_date, get_today
 
 
 class Task:
     """This class stores information about a task."""
 
-    def __init__(self, name="", subject="", priority=1, due_date_string="None", is_completed=False):
-        """Initialize Task class, setting name, subject, priority and is_completed."""
+    def __init__(self, name="", subject="", priority=1, due_date_string="None", is_completed=False, task_id=None):
+        """Initialize Task class, setting name, subject, priority and is_completed.
+        task_id is given to the task by the TaskCollection it is added to if it is None.
+        is_dirty is True if the task has changed since it was last saved."""
+        self.task_id = task_id
         self.name = name
         self.subject = subject
         self.priority = priority
-        self.due_date = Date(due_date_string)
+        self.due_date_string = due_date_string
+        self._due_date = None
         self.is_completed = is_completed
+        self.is_dirty = False
 
     def __str__(self):
         """Define rules for printing class objects."""
@@ -23,30 +27,40 @@ class Task:
             ", due {}".format(self.due_date) if self.due_date.is_valid_date() else "",
             " (completed)" if self.is_completed else "")
 
+    @property
+    def due_date(self):
+        """Return the task's due date, only getting the Date object the first time it is needed.
+        Tasks with the same due date string share the same Date."""
+        if self._due_date is None:
+            self._due_date = get_date(self.due_date_string)
+        return self._due_date
+
     def mark_as_completed(self):
         """Mark the task as completed."""
         self.is_completed = True
+        self.is_dirty = True
 
     def mark_as_uncompleted(self):
         """Mark the task as uncompleted."""
         self.is_completed = False
+        self.is_dirty = True
+
+    def change_priority(self, amount):
+        """Change the task's priority by amount."""
+        self.priority += amount
+        self.is_dirty = True
 
     def is_important(self):
         """Return True if task is important, False if it is not."""
         return self.priority <= 3
 
-    def is_due(self):
-        """Return True if task is due today or overdue, False if it is not."""
-        current_date_string = "{}/{}/{}".format(datetime.now().day, datetime.now().month, datetime.now().year)
-        current_date = Date("{}/{}/{}".format(
-            datetime.now().day,
-            datetime.now().month,
-            datetime.now().year
-        ))
-        if self.due_date.is_valid_date():
-            return not current_date < self.due_date
-        else:
-            return False
+    def is_due(self, today=None):
+        """Return True if task is due today or overdue, False if it is not.
+        today is the Date to check against, or today's Date if it is None."""
+        if today is None:
+            today = get_today()
+        # Tasks with no due date or an invalid due date have an ordinal later than any date
+        return self.due_date.ordinal <= today.ordinal
 
 
 if __name__ == '__main__':
@@ -59,5 +73,4 @@ if __name__ == '__main__':
     print(task1.due_date < task2.due_date)
     print(task1.due_date.is_valid_date())
     print(task3.is_due())
-    print(task3.due_date.is_leap_year())
     print(task3.due_date.is_valid_date())
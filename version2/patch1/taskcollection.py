@@ -1,8 +1,25 @@
 """Task Collection - This class represents a collection of tasks.
 Functionality: loading & saving tasks to file, adding tasks to list, returning info, sorting."""
 
+import csv
+import os
+from itertools import islice, repeat
 from operator import attrgetter
+from threading import Thread
 from version2.patch1.task import Task
+from version2.patch1.date import get_date
+from version2.patch1.sortedtaskindex import SortedTaskIndex
+from version2.patch1.taskjournal import TaskJournal
+
+TASK_BATCH_SIZE = 500
+# Number of sort orders kept up to date at once, so switching back to a recent order is instant
+MAX_SORT_INDEXES = 2
+# Sorting keys whose attribute is not compared directly
+SORT_KEYS_TO_ATTRIBUTES = {"due_date": "due_date.ordinal"}
+JOURNAL_EXTENSION = ".journal"
+TEMPORARY_FILE_EXTENSION = ".tmp"
+# Characters that a field of a tasks file has to be quoted to contain
+SPECIAL_CHARACTERS = set(',"\r\n')
 
 
 class TaskCollection:
@@ -11,6 +28,21 @@ class TaskCollection:
     def __init__(self):
         """Initialize class, create tasks list."""
         self.tasks = []
+        self.tasks_by_id = {}
+        self.next_task_id = 1
+        # Sorted indexes by (key1, key2), least recently used first. Once tasks have been sorted,
+        # self.tasks is the task list of the most recently used index.
+        self.sort_indexes = {}
+        self.is_reversed = False
+        # Journal that changes are recorded to, if journal saving is used
+        self.journal = None
+        self.compaction_thread = None
+        # Whether tasks have been added, removed or changed since they were last saved
+        self.is_dirty = False
+
+    def __len__(self):
+        """Return the number of tasks in the collection."""
+        return len(self.tasks)
 
     def __str__(self):
         """Define rules for printing class objects."""
@@ -20,39 +52,326 @@ class TaskCollection:
         return class_string
 
     def load_tasks(self, file_name):
-        """Read tasks from a file and add to tasks list."""
-        with open(file_name, 'r') as file_in:
-            for line in file_in:
+        """Read tasks from a file and add to tasks list. Return a list of (line number, row) of
+        the rows that are not valid tasks."""
+        rejected_rows = []
+        for batch in self.read_task_batches(file_name, rejected_rows=rejected_rows):
+            self.add_tasks(batch)
+        self.finish_loading(file_name)
+        return rejected_rows
+
+    @staticmethod
+    def read_task_batches(file_name, batch_size=TASK_BATCH_SIZE, rejected_rows=None):
+        """Read tasks from a CSV file, yielding them in lists of up to batch_size tasks.
+        Due dates are left as strings until a task's due date is first used.
+        Files saved before tasks had IDs have no ID column, so their tasks are given new IDs.
+        Rows that are not valid tasks are skipped and added to rejected_rows as (line number, row)."""
+        with open(file_name, 'r', newline='') as file_in:
+            line_number = 1
+            while True:
+                lines = list(islice(file_in, batch_size))
+                if not lines:
+                    break
+                # A quoted field can contain new lines, so lines are added until every quote is closed
+                number_of_quotes = sum(map(str.count, lines, repeat('"')))
+                while number_of_quotes % 2:
+                    line = file_in.readline()
+                    if not line:
+                        break
+                    lines.append(line)
+                    number_of_quotes += line.count('"')
+                # Convert the whole batch at once, only checking rows one by one if any are invalid
+                try:
+                    if number_of_quotes:
+                        batch = TaskCollection.parse_columns(TaskCollection.get_columns(csv.reader(lines)))
+                    else:
+                        batch = TaskCollection.parse_columns(TaskCollection.split_columns(lines))
+                except (IndexError, ValueError):
+                    batch = TaskCollection.parse_rows(csv.reader(lines), line_number, rejected_rows)
+                line_number += len(lines)
+                yield batch
+
+    @staticmethod
+    def split_columns(lines):
+        """Return the columns of lines without quoted fields, splitting every line at once, as that is
+        much faster than the csv reader or splitting each line. Raise ValueError if the lines do not
+        all have the same number of fields."""
+        numbers_of_commas = list(map(str.count, lines, repeat(",")))
+        number_of_fields = numbers_of_commas[0] + 1
+        if numbers_of_commas.count(number_of_fields - 1) != len(numbers_of_commas):
+            raise ValueError("rows have different numbers of fields")
+        fields = ",".join(map(str.rstrip, lines, repeat("\r\n"))).split(",")
+        return [fields[column::number_of_fields] for column in range(number_of_fields)]
+
+    @staticmethod
+    def get_columns(rows):
+        """Return the columns of rows, raising ValueError if they do not all have the same number of fields."""
+        rows = list(rows)
+        if any(len(row) != len(rows[0]) for row in rows):
+            raise ValueError("rows have different numbers of fields")
+        return list(zip(*rows))
+
+    @staticmethod
+    def parse_columns(columns):
+        """Return a list of Tasks from the columns of rows of a tasks file, converting each column at
+        once rather than each row, and checking each distinct due date once. Raise IndexError or
+        ValueError if any row is invalid."""
+        if len(columns) not in (5, 6):
+            raise ValueError("rows have {} fields".format(len(columns)))
+        for due_date_string in set(columns[3]):
+            get_date(due_date_string)
+        task_ids = map(int, columns[5]) if len(columns) == 6 else repeat(None)
+        return list(map(Task, columns[0], columns[1], map(int, columns[2]), columns[3],
+                        map("True".__eq__, columns[4]), task_ids))
+
+    def finish_loading(self, file_name):
+        """Called once every batch of tasks read from file_name has been added."""
+
+    @staticmethod
+    def parse_rows(rows, line_number, rejected_rows=None):
+        """Return a list of Tasks from rows of a tasks file starting at line_number, adding each
+        row that is not a valid task to rejected_rows as (line number, row). Blank rows are skipped."""
+        tasks = []
+        for row in rows:
+            if row:
                 try:
-                    parts = line.strip().split(",")
-                    parts[2] = int(parts[2])
-                    parts[4] = parts[4] == "True"
-                    self.tasks.append(Task(parts[0], parts[1], parts[2], parts[3], parts[4]))
-                except IndexError:
-                    continue
-                except ValueError:
-                    continue
-
-    def save_tasks(self, file_name):
-        """Write all tasks to a file."""
-        with open(file_name, 'w') as file_out:
-            for task in self.tasks:
-                print("{},{},{},{},{}".format(task.name, task.subject, task.priority, task.due_date, task.is_completed), file=file_out)
+                    tasks.append(TaskCollection.parse_fields(row))
+                except (IndexError, ValueError):
+                    if rejected_rows is not None:
+                        rejected_rows.append((line_number, row))
+            # Quoted fields can contain new lines
+            line_number += 1 + sum(field.count("\n") for field in row)
+        return tasks
+
+    @staticmethod
+    def parse_task(line):
+        """Return a Task from a line of a tasks file, raising IndexError or ValueError if the line is invalid.
+        Lines without quoted fields are split directly, as that is much faster than the csv reader."""
+        if '"' not in line:
+            return TaskCollection.parse_fields(line.split(","))
+        return TaskCollection.parse_fields(next(csv.reader([line])))
+
+    @staticmethod
+    def parse_fields(fields):
+        """Return a Task from the fields of a row of a tasks file, raising IndexError or ValueError
+        if the row is invalid. The due date is checked with the cached get_date(), but the task
+        only gets its Date when its due date is first used."""
+        task_id = int(fields[5]) if len(fields) > 5 and fields[5] else None
+        get_date(fields[3])
+        return Task(fields[0], fields[1], int(fields[2]), fields[3], fields[4] == "True", task_id)
+
+    @staticmethod
+    def format_task(task):
+        """Return the line of a tasks file that stores task."""
+        quote_field = TaskCollection.quote_field
+        return "{},{},{},{},{},{}".format(quote_field(task.name), quote_field(task.subject), task.priority,
+                                          quote_field(task.due_date_string), task.is_completed, task.task_id)
+
+    @staticmethod
+    def quote_field(text):
+        """Return text as a CSV field, quoting it if it contains a comma, quote or new line."""
+        if SPECIAL_CHARACTERS.isdisjoint(text):
+            return text
+        return '"{}"'.format(text.replace('"', '""'))
+
+    def save_tasks(self, file_name, tasks=None):
+        """Write all tasks to a file. Any journal records are then no longer needed.
+        tasks is a snapshot of the tasks to write when saving on another thread."""
+        self.wait_for_compaction()
+        if tasks is None:
+            tasks = self.snapshot_tasks()
+        self.write_lines(file_name, (self.format_task(task) for task in tasks))
+        if self.journal is not None:
+            self.journal.clear()
+
+    def snapshot_tasks(self):
+        """Return a list of every task and mark the collection and its tasks as saved. Changes made
+        after the snapshot mark the collection as dirty again, even if they happen while it is being
+        saved. Tasks are marked here rather than as they are written, so the saving thread never
+        changes a task."""
+        self.is_dirty = False
+        tasks = list(self.tasks)
+        for task in tasks:
+            task.is_dirty = False
+        return tasks
+
+    def open_journal(self, file_name):
+        """Start recording changes to the journal of tasks file file_name."""
+        self.journal = TaskJournal(file_name + JOURNAL_EXTENSION)
+
+    def replay_journal(self):
+        """Apply the changes recorded in the journal to the loaded tasks."""
+        journal, self.journal = self.journal, None
+        try:
+            journal.replay(self)
+        finally:
+            self.journal = journal
+
+    def compact_journal(self, file_name):
+        """Write all tasks to file_name on a background thread, then delete the journal records
+        that the file now contains. Changes made meanwhile are recorded to a new journal."""
+        if self.compaction_thread is not None and self.compaction_thread.is_alive():
+            return
+        lines = [self.format_task(task) for task in self.tasks]
+        self.journal.rotate()
+        self.compaction_thread = Thread(target=self.write_compacted_tasks, args=(file_name, lines, self.journal))
+        self.compaction_thread.start()
+
+    @staticmethod
+    def write_compacted_tasks(file_name, lines, journal):
+        """Replace file_name with lines, then delete the journal's old records."""
+        TaskCollection.write_lines(file_name, lines)
+        journal.discard_old_records()
+
+    @staticmethod
+    def write_lines(file_name, lines):
+        """Write lines to a temporary file, then rename it to file_name, so that the tasks file
+        is never left half written if the program stops while saving."""
+        temporary_file_name = file_name + TEMPORARY_FILE_EXTENSION
+        with open(temporary_file_name, 'w') as file_out:
+            for line in lines:
+                print(line, file=file_out)
+            file_out.flush()
+            os.fsync(file_out.fileno())
+        os.replace(temporary_file_name, file_name)
+
+    def wait_for_compaction(self):
+        """Wait for a background compaction to finish, if one is running."""
+        if self.compaction_thread is not None:
+            self.compaction_thread.join()
+            self.compaction_thread = None
 
     def add_task(self, task=Task()):
         """Add Task object to tasks list and return a string confirming that task was added."""
-        self.tasks.append(task)
+        self.register_task_id(task)
+        if self.sort_indexes:
+            for index in self.sort_indexes.values():
+                index.add_task(task)
+        else:
+            self.tasks.append(task)
+        self.is_dirty = True
+        if self.journal is not None:
+            self.journal.record("add", self.format_task(task))
+
+    def add_tasks(self, tasks):
+        """Add a list of Task objects to tasks list."""
+        for task in tasks:
+            self.register_task_id(task)
+        if self.sort_indexes:
+            for index in self.sort_indexes.values():
+                index.add_tasks(tasks)
+        else:
+            self.tasks.extend(tasks)
+
+    def register_task_id(self, task):
+        """Add task to the ID index, giving it a new ID if it has none or its ID is taken."""
+        if task.task_id is None or task.task_id in self.tasks_by_id:
+            task.task_id = self.next_task_id
+        self.next_task_id = max(self.next_task_id, task.task_id + 1)
+        self.tasks_by_id[task.task_id] = task
+
+    def get_task(self, task_id):
+        """Return the task with task_id, or None if there is no such task."""
+        return self.tasks_by_id.get(task_id)
 
     def remove_task(self, task=Task()):
         """Remove Task object from tasks list and return the task that was removed."""
-        if task in self.tasks:
-            self.tasks.remove(task)
+        if self.tasks_by_id.get(task.task_id) is task:
+            del self.tasks_by_id[task.task_id]
+            if self.sort_indexes:
+                for index in self.sort_indexes.values():
+                    index.remove_task(task)
+            else:
+                self.tasks.remove(task)
+            self.is_dirty = True
+            if self.journal is not None:
+                self.journal.record("remove", task.task_id)
             return str(task) + " removed."
 
+    def remove_completed_tasks(self):
+        """Remove all completed tasks in a single pass and return the number of tasks removed."""
+        removed_tasks = [task for task in self.tasks if task.is_completed]
+        for task in removed_tasks:
+            del self.tasks_by_id[task.task_id]
+            if self.journal is not None:
+                self.journal.record("remove", task.task_id)
+        if removed_tasks:
+            self.is_dirty = True
+            is_completed = attrgetter("is_completed")
+            if self.sort_indexes:
+                for index in self.sort_indexes.values():
+                    index.remove_tasks_where(is_completed)
+            else:
+                self.tasks[:] = [task for task in self.tasks if not task.is_completed]
+        return len(removed_tasks)
+
+    def update_task(self, task, change, *args):
+        """Call change with args to change task, then move task to its new place in each sort index."""
+        indexes = [index for index in self.sort_indexes.values() if index.remove_task(task)]
+        change(*args)
+        self.is_dirty = True
+        for index in indexes:
+            index.add_task(task)
+
+    def mark_task_as_completed(self, task):
+        """Mark task as completed, keeping tasks sorted."""
+        self.update_task(task, task.mark_as_completed)
+        if self.journal is not None:
+            self.journal.record("complete", task.task_id)
+
+    def mark_task_as_uncompleted(self, task):
+        """Mark task as uncompleted, keeping tasks sorted."""
+        self.update_task(task, task.mark_as_uncompleted)
+        if self.journal is not None:
+            self.journal.record("uncomplete", task.task_id)
+
+    def change_task_priority(self, task, amount):
+        """Change the priority of task by amount, keeping tasks sorted."""
+        self.update_task(task, task.change_priority, amount)
+        if self.journal is not None:
+            self.journal.record("priority", task.task_id, task.priority)
+
     def get_num_of_uncompleted_tasks(self):
         """Return the number of uncompleted tasks in tasks."""
         return len([task for task in self.tasks if not task.is_completed])
 
+    def get_sorted_tasks(self):
+        """Return an iterator over tasks in sorted order, taking reversed sorting into account."""
+        return reversed(self.tasks) if self.is_reversed else iter(self.tasks)
+
+    def get_sorted_rows(self, offset=0, limit=-1):
+        """Return a page of the rows of tasks in sorted order, taking reversed sorting into account.
+        The row of a task is its ID, which get_row_task() returns the task of. offset and limit
+        select the page, with a limit of -1 selecting every row after offset."""
+        return [task.task_id for task in get_page(self.tasks, self.is_reversed, offset, limit)]
+
+    def get_row_task(self, row):
+        """Return the task in row, as returned by get_sorted_rows()."""
+        return self.tasks_by_id[row]
+
     def sort_tasks(self, key1="is_completed", key2="due_date", is_reversed=False):
-        """Sort tasks list by passed in key first, then by priority."""
-        self.tasks.sort(key=attrgetter(key1, key2, "priority"), reverse=is_reversed)
+        """Sort tasks list by passed in key first, then by priority.
+        Due dates are sorted by their ordinal so that no Date comparisons are needed,
+        and tasks that are otherwise equal are sorted by ID.
+        Each sort order is only sorted in full the first time it is used, after which it is
+        kept sorted as tasks change. Reversed sorting iterates the same order backwards."""
+        index = self.sort_indexes.pop((key1, key2), None)
+        if index is None:
+            attribute1 = SORT_KEYS_TO_ATTRIBUTES.get(key1, key1)
+            attribute2 = SORT_KEYS_TO_ATTRIBUTES.get(key2, key2)
+            index = SortedTaskIndex(attrgetter(attribute1, attribute2, "priority", "task_id"), self.tasks)
+            if len(self.sort_indexes) >= MAX_SORT_INDEXES:
+                del self.sort_indexes[next(iter(self.sort_indexes))]
+        self.sort_indexes[(key1, key2)] = index
+        self.tasks = index.tasks
+        self.is_reversed = is_reversed
+
+
+def get_page(items, is_reversed, offset=0, limit=-1):
+    """Return a slice of a page of items, counting from the end of items if is_reversed.
+    A limit of -1 selects every item after offset."""
+    offset = min(offset, len(items))
+    stop = len(items) if limit < 0 else min(offset + limit, len(items))
+    if is_reversed:
+        return items[len(items) - stop:len(items) - offset][::-1]
+    return items[offset:stop]
@@ -0,0 +1,60 @@
+"""Task ID Index - This class finds the row of a task from its ID.
+IDs and rows are stored in two integer arrays sorted by ID, and an ID is found by binary search,
+so the index takes 16 bytes per task rather than a dictionary entry and two int objects."""
+
+from array import array
+from bisect import bisect_left
+
+
+class TaskIdIndex:
+    """Rows of tasks, sorted by task ID."""
+
+    def __init__(self):
+        """Initialize TaskIdIndex class, with no tasks."""
+        self.task_ids = array('q')
+        self.rows = array('q')
+
+    def __len__(self):
+        """Return the number of tasks in the index."""
+        return len(self.task_ids)
+
+    def __contains__(self, task_id):
+        """Return True if a task with task_id is in the index."""
+        return self.find(task_id) != -1
+
+    def find(self, task_id):
+        """Return the position of task_id in the index, or -1 if it is not in the index."""
+        position = bisect_left(self.task_ids, task_id)
+        if position < len(self.task_ids) and self.task_ids[position] == task_id:
+            return position
+        return -1
+
+    def get_row(self, task_id):
+        """Return the row of the task with task_id, or None if it is not in the index."""
+        position = self.find(task_id)
+        return None if position == -1 else self.rows[position]
+
+    def add(self, task_id, row):
+        """Add the row of a task whose ID is not in the index. Adding IDs in increasing order appends them."""
+        position = bisect_left(self.task_ids, task_id)
+        self.task_ids.insert(position, task_id)
+        self.rows.insert(position, row)
+
+    def add_rows(self, task_ids, rows):
+        """Add rows in bulk to an empty index, where task_ids is the column of the ID of each row.
+        Return a list of the rows whose ID is taken by an earlier row, which are not added."""
+        taken_rows = []
+        for row in sorted(rows, key=task_ids.__getitem__):
+            task_id = task_ids[row]
+            if self.task_ids and self.task_ids[-1] == task_id:
+                taken_rows.append(row)
+            else:
+                self.task_ids.append(task_id)
+                self.rows.append(row)
+        return taken_rows
+
+    def remove_rows(self, rows):
+        """Remove the tasks in a set of rows, in a single pass."""
+        kept = [position for position, row in enumerate(self.rows) if row not in rows]
+        self.task_ids = array('q', [self.task_ids[position] for position in kept])
+        self.rows = array('q', [self.rows[position] for position in kept])
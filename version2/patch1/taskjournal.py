@@ -0,0 +1,103 @@
+"""Task Journal - This class represents an append-only log of changes made to a task collection.
+Each change is appended to the journal file as it happens, so saving costs the size of the change
+rather than the size of the collection. Replaying the journal on top of the tasks file restores
+every change made since the tasks file was last written."""
+
+import os
+
+OLD_JOURNAL_EXTENSION = ".old"
+
+
+class TaskJournal:
+    """Journal file that records adds, completions, priority changes and removals of tasks."""
+
+    def __init__(self, file_name):
+        """Initialize TaskJournal class, opening file_name to append records to."""
+        self.file_name = file_name
+        self.old_file_name = file_name + OLD_JOURNAL_EXTENSION
+        self.number_of_records = 0
+        self.file_out = open(self.file_name, 'a')
+
+    def record(self, action, *values):
+        """Append a record of an action and its values to the journal."""
+        print(",".join([action] + [str(value) for value in values]), file=self.file_out, flush=True)
+        self.number_of_records += 1
+
+    def rotate(self):
+        """Move the records written so far to the old journal file and start a new journal.
+        Records are added to the old journal if it still exists from an unfinished compaction."""
+        self.file_out.close()
+        if os.path.exists(self.old_file_name):
+            with open(self.file_name, 'r') as file_in, open(self.old_file_name, 'a') as file_out:
+                file_out.write(file_in.read())
+            os.remove(self.file_name)
+        else:
+            os.replace(self.file_name, self.old_file_name)
+        self.number_of_records = 0
+        self.file_out = open(self.file_name, 'a')
+
+    def discard_old_records(self):
+        """Delete the old journal file once the tasks file contains its records."""
+        if os.path.exists(self.old_file_name):
+            os.remove(self.old_file_name)
+
+    def clear(self):
+        """Delete every record, for when the whole collection has just been saved."""
+        self.file_out.close()
+        self.discard_old_records()
+        self.number_of_records = 0
+        self.file_out = open(self.file_name, 'w')
+
+    def close(self):
+        """Close the journal file."""
+        self.file_out.close()
+
+    def replay(self, task_collection):
+        """Apply the records in the old journal, then the journal, to task_collection.
+        Every record can be applied more than once with the same result, so records written while
+        tasks were still loading are safe to replay. A record cut off by a crash is removed, and
+        records that are not valid are skipped."""
+        for file_name in (self.old_file_name, self.file_name):
+            if not os.path.exists(file_name):
+                continue
+            self.remove_incomplete_record(file_name)
+            with open(file_name, 'r') as file_in:
+                for line in file_in:
+                    try:
+                        self.apply_record(task_collection, line)
+                    except (IndexError, ValueError):
+                        continue
+                    if file_name == self.file_name:
+                        self.number_of_records += 1
+
+    @staticmethod
+    def remove_incomplete_record(file_name):
+        """Truncate file_name after its last complete record, so a record that was only partly
+        written when TaskTracker crashed is neither replayed nor joined to the next record."""
+        with open(file_name, 'rb') as file_in:
+            contents = file_in.read()
+        end = contents.rfind(b"\n") + 1
+        if end < len(contents):
+            os.truncate(file_name, end)
+
+    @staticmethod
+    def apply_record(task_collection, line):
+        """Apply the record on line to task_collection, raising IndexError or ValueError if it is not valid."""
+        action, _, values = line.rstrip("\n").partition(",")
+        if action == "add":
+            task = task_collection.parse_task(values)
+            if task_collection.get_task(task.task_id) is None:
+                task_collection.add_task(task)
+            return
+        values = values.split(",")
+        task = task_collection.get_task(int(values[0]))
+        if task is None:
+            return
+        elif action == "complete":
+            task_collection.mark_task_as_completed(task)
+        elif action == "uncomplete":
+            task_collection.mark_task_as_uncompleted(task)
+        elif action == "priority":
+            task_collection.change_task_priority(task, int(values[1]) - task.priority)
+        elif action == "remove":
+            task_collection.remove_task(task)